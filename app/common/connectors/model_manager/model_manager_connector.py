@@ -1,40 +1,64 @@
+import orjson
+import os
 import requests
 import logging
-from typing import List, Optional
+import tempfile
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from app.common.connectors.model_manager.model_manager_models import (
     Model,
+    ModelFileDownload,
     ModelMetadata,
     PowerPlant,
 )
 
 logger = logging.getLogger(__name__)
 
+# Model files are streamed to disk in chunks of this size instead of being held
+# in memory as a whole
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+T = TypeVar("T", bound=BaseModel)
+
+_POWER_PLANTS_ADAPTER = TypeAdapter(List[PowerPlant])
+_MODELS_METADATA_ADAPTER = TypeAdapter(List[ModelMetadata])
+_MODELS_ADAPTER = TypeAdapter(List[Model])
+
 
 class ModelManagerConnector:
 
     def __init__(self, base_url: str):
         self.base_url = base_url.rstrip("/")
         self.timeout = 30
+        # One pooled session so repeated calls to the model manager reuse connections
+        self._session = requests.Session()
+        self._session.mount(
+            self.base_url,
+            HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=16,
+                # Rate limited requests are retried too, after the Retry-After
+                # delay when the model manager sends one
+                max_retries=Retry(
+                    total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504]
+                ),
+            ),
+        )
+        # ETag and validated items of the last response per list endpoint URL
+        self._list_cache: Dict[str, Tuple[str, List[Any]]] = {}
+
+    def close(self) -> None:
+        self._session.close()
 
     def fetch_active_power_plants(self) -> Optional[List[PowerPlant]]:
         try:
             url = f"{self.base_url}/internal/power-plant/active"
 
-            response = requests.get(url, timeout=self.timeout)
-            response.raise_for_status()
-
-            data = response.json()
-
-            power_plants = []
-            for plant_data in data:
-                try:
-                    power_plant = PowerPlant(**plant_data)
-                    power_plants.append(power_plant)
-                except Exception as e:
-                    logger.error(f"Failed to parse power plant data {plant_data}: {e}")
-                    continue
-
-            return power_plants
+            return self._fetch_list_if_modified(
+                url, _POWER_PLANTS_ADAPTER, PowerPlant, "power plant data"
+            )
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to fetch power plants: {e}")
@@ -47,21 +71,9 @@ class ModelManagerConnector:
         try:
             url = f"{self.base_url}/internal/models/active"
 
-            response = requests.get(url, timeout=self.timeout)
-            response.raise_for_status()
-
-            json_data = response.json()
-
-            models_metadata = []
-            for json_model_metadata in json_data:
-                try:
-                    model_metadata = ModelMetadata(**json_model_metadata)
-                    models_metadata.append(model_metadata)
-                except Exception as e:
-                    logger.error(
-                        f"Failed to parse model metadata {json_model_metadata}: {e}"
-                    )
-                    continue
+            models_metadata = self._fetch_list_if_modified(
+                url, _MODELS_METADATA_ADAPTER, ModelMetadata, "model metadata"
+            )
 
             logger.info(f"Successfully fetched {len(models_metadata)} active models")
             return models_metadata
@@ -77,19 +89,14 @@ class ModelManagerConnector:
         try:
             url = f"{self.base_url}/power_plant/{plant_id}/models"
 
-            response = requests.get(url, timeout=self.timeout)
+            response = self._session.get(url, timeout=self.timeout)
             response.raise_for_status()
 
-            models_data = response.json()
+            models_data = orjson.loads(response.content)
 
-            models = []
-            for model_data in models_data:
-                try:
-                    model = Model(**model_data)
-                    models.append(model)
-                except Exception as e:
-                    logger.error(f"Failed to parse model data {model_data}: {e}")
-                    continue
+            models = self._validate_items(
+                _MODELS_ADAPTER, Model, models_data, "model data"
+            )
 
             logger.info(
                 f"Successfully fetched {len(models)} models for plant {plant_id}"
@@ -108,9 +115,9 @@ class ModelManagerConnector:
     def fetch_model(self, model_id: int) -> Optional[Model]:
         try:
             url = f"{self.base_url}/models/{model_id}"
-            response = requests.get(url, timeout=self.timeout)
+            response = self._session.get(url, timeout=self.timeout)
             response.raise_for_status()
-            return Model(**response.json())
+            return Model.model_validate_json(response.content)
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to fetch model {model_id}: {e}")
             return None
@@ -119,23 +126,54 @@ class ModelManagerConnector:
             return None
 
     def download_model_file(self, model_id: int) -> Optional[bytes]:
+        download = self.download_model_file_if_modified(model_id)
+        if download is None:
+            return None
+
+        try:
+            with open(download.file_path, "rb") as model_file:
+                return model_file.read()
+        finally:
+            os.remove(download.file_path)
+
+    def download_model_file_if_modified(
+        self, model_id: int, etag: Optional[str] = None
+    ) -> Optional[ModelFileDownload]:
+        """
+        Download a model file to a temporary file, sending the ETag of the
+        previous download if given. The caller owns the returned file. Returns a
+        not_modified result when the file has not changed and None when the
+        download failed.
+        """
         try:
             url = f"{self.base_url}/internal/models/{model_id}/download"
+            headers = {"If-None-Match": etag} if etag else None
+
+            with self._session.get(
+                url, headers=headers, timeout=self.timeout, stream=True
+            ) as response:
+                if response.status_code == 304:
+                    logger.info(
+                        f"Model {model_id} file not modified, skipping download"
+                    )
+                    return ModelFileDownload(etag=etag, not_modified=True)
 
-            response = requests.get(url, timeout=self.timeout)
-            response.raise_for_status()
+                response.raise_for_status()
+
+                content_type = response.headers.get("content-type", "")
+                if content_type != "application/octet-stream":
+                    logger.warning(
+                        f"Unexpected content type for model {model_id}: {content_type}"
+                    )
 
-            content_type = response.headers.get("content-type", "")
-            if content_type != "application/octet-stream":
-                logger.warning(
-                    f"Unexpected content type for model {model_id}: {content_type}"
-                )
+                file_path, file_size = self._save_to_temporary_file(response)
 
-            file_content = response.content
             logger.info(
-                f"Successfully downloaded model {model_id}, size: {len(file_content)} bytes"
+                f"Successfully downloaded model {model_id}, size: {file_size} bytes"
+            )
+            return ModelFileDownload(
+                file_path=file_path, etag=response.headers.get("etag")
             )
-            return file_content
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to download model {model_id}: {e}")
@@ -143,3 +181,75 @@ class ModelManagerConnector:
         except Exception as e:
             logger.error(f"Unexpected error while downloading model {model_id}: {e}")
             return None
+
+    def _save_to_temporary_file(self, response: requests.Response) -> Tuple[str, int]:
+        with tempfile.NamedTemporaryFile(
+            suffix=".download", delete=False
+        ) as model_file:
+            try:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    model_file.write(chunk)
+                return model_file.name, model_file.tell()
+            except BaseException:
+                model_file.close()
+                os.remove(model_file.name)
+                raise
+
+    def _fetch_list_if_modified(
+        self,
+        url: str,
+        adapter: TypeAdapter,
+        model_class: Type[T],
+        item_name: str,
+    ) -> List[T]:
+        """
+        Fetch and validate a list endpoint with a conditional GET. When the
+        server answers 304 Not Modified, the items of the last response are
+        returned without transferring or validating them again.
+        """
+        cached = self._list_cache.get(url)
+        headers = {"If-None-Match": cached[0]} if cached else None
+
+        response = self._session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached:
+            logger.debug(f"{item_name} not modified, reusing the previous response")
+            return cached[1]
+
+        response.raise_for_status()
+
+        items = self._validate_items(
+            adapter, model_class, orjson.loads(response.content), item_name
+        )
+
+        etag = response.headers.get("etag")
+        if etag:
+            self._list_cache[url] = (etag, items)
+        else:
+            self._list_cache.pop(url, None)
+
+        return items
+
+    def _validate_items(
+        self,
+        adapter: TypeAdapter,
+        model_class: Type[T],
+        items: List[Any],
+        item_name: str,
+    ) -> List[T]:
+        """
+        Validate the whole list in one pass. If any item is invalid, validate
+        them one by one so the invalid ones are logged and skipped.
+        """
+        try:
+            return adapter.validate_python(items)
+        except ValidationError:
+            pass
+
+        valid_items = []
+        for item in items:
+            try:
+                valid_items.append(model_class.model_validate(item))
+            except Exception as e:
+                logger.error(f"Failed to parse {item_name} {item}: {e}")
+
+        return valid_items
@@ -26,3 +26,9 @@ class Model(BaseModel):
     plant_name: str
     is_active: bool
     file_type: str
+
+
+class ModelFileDownload(BaseModel):
+    file_path: Optional[str] = None  # None when the file was not modified
+    etag: Optional[str] = None
+    not_modified: bool = False
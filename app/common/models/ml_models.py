@@ -1,15 +1,39 @@
 from abc import ABC, abstractmethod
-from typing import Any, List
+from typing import Any, List, Union
+import hashlib
 import joblib
+import logging
+import numpy as np
 import pickle
 from typing import Optional
 import io
+import os
 import zipfile
 import tempfile
 import importlib.util
 import sys
+import threading
 from app.common.connectors.model_manager.model_manager_models import ModelMetadata
 
+logger = logging.getLogger(__name__)
+
+# Directory that keeps uncompressed copies of loaded joblib models, named after
+# the hash of the downloaded file, so that after a restart they are memory-mapped
+# in place instead of unpickled again. Disabled when unset.
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR")
+
+# Feature rows as nested lists or an already built (data points, features) matrix
+Features = Union[List[List[float]], np.ndarray]
+
+
+def _to_feature_matrix(features: Features) -> np.ndarray:
+    """
+    Convert feature rows into the contiguous float64 matrix the estimators work
+    on, so predict does not coerce the nested lists again. Arrays that already
+    match are passed through without a copy.
+    """
+    return np.ascontiguousarray(features, dtype=np.float64)
+
 
 class MLModel(ABC):
 
@@ -25,18 +49,122 @@ class MLModel(ABC):
         pass
 
     @abstractmethod
-    def predict(self, features: List[List[float]]) -> List[float]:
+    def predict(self, features: Features) -> List[float]:
+        pass
+
+    def warm_up(self):
+        """Load whatever the model defers until its first predict."""
         pass
 
 
 class JoblibModel(MLModel):
 
     def _load(self, file_content: bytes):
-        file_like_object = io.BytesIO(file_content)
-        self._model = joblib.load(file_like_object)
+        # Loading from a file lets joblib memory-map the model's numpy arrays
+        # instead of copying them onto the heap. The mapping stays valid after
+        # the temporary file is removed. Compressed files are loaded normally.
+        with tempfile.NamedTemporaryFile(suffix=".joblib") as model_file:
+            model_file.write(file_content)
+            model_file.flush()
+            self._model = joblib.load(model_file.name, mmap_mode="r")
+
+    def predict(self, features: Features) -> List[float]:
+        return self._model.predict(_to_feature_matrix(features))
+
+
+class LazyJoblibModel(JoblibModel):
+    """
+    Joblib model that loads on the first predict, so a state refresh does not
+    pay the load cost of every model up front. Until then the file waits in a
+    temporary file on disk rather than as bytes on the heap. A model created
+    from an already downloaded file takes that file over instead of copying it.
+    """
+
+    def __init__(
+        self,
+        metadata: ModelMetadata,
+        file_content: Optional[bytes] = None,
+        file_path: Optional[str] = None,
+    ):
+        self._load_lock = threading.Lock()
+        self._model_path: Optional[str] = file_path
+        self._cache_path: Optional[str] = None
+        super().__init__(metadata, file_content)
 
-    def predict(self, features: List[List[float]]) -> List[float]:
-        return self._model.predict(features)
+    def _load(self, file_content: Optional[bytes]):
+        if MODEL_CACHE_DIR:
+            self._cache_path = os.path.join(
+                MODEL_CACHE_DIR, f"{self._file_digest(file_content)}.joblib"
+            )
+            if os.path.exists(self._cache_path):
+                self._remove_model_file()
+                return
+
+        if self._model_path is None:
+            with tempfile.NamedTemporaryFile(
+                suffix=".joblib", delete=False
+            ) as model_file:
+                self._model_path = model_file.name
+                model_file.write(file_content)
+
+    def _file_digest(self, file_content: Optional[bytes]) -> str:
+        if file_content is not None:
+            return hashlib.blake2b(file_content, digest_size=16).hexdigest()
+
+        with open(self._model_path, "rb") as model_file:
+            return hashlib.file_digest(
+                model_file, lambda: hashlib.blake2b(digest_size=16)
+            ).hexdigest()
+
+    def warm_up(self):
+        if self._model is None:
+            # Models of one plant may be predicted from several threads at once,
+            # and warmed up in the background at the same time
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+
+    def predict(self, features: Features) -> List[float]:
+        self.warm_up()
+        return super().predict(features)
+
+    def _load_model(self) -> Any:
+        if self._model_path is None:
+            return joblib.load(self._cache_path, mmap_mode="r")
+
+        model = joblib.load(self._model_path, mmap_mode="r")
+        self._remove_model_file()
+        if self._cache_path is not None:
+            self._write_cache(model)
+        return model
+
+    def _write_cache(self, model: Any):
+        # Written uncompressed so the next load can memory-map it, and renamed
+        # into place so a concurrent or interrupted write is never picked up
+        temp_path = f"{self._cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+            joblib.dump(model, temp_path, compress=0)
+            os.replace(temp_path, self._cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to cache model {self.metadata.id}: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _remove_model_file(self):
+        # The memory mapping stays valid after the file is removed
+        model_path = getattr(self, "_model_path", None)
+        if model_path is not None:
+            self._model_path = None
+            try:
+                os.remove(model_path)
+            except OSError:
+                pass
+
+    def __del__(self):
+        self._remove_model_file()
 
 
 class PickleModel(MLModel):
@@ -45,8 +173,8 @@ class PickleModel(MLModel):
         file_like_object = io.BytesIO(file_content)
         self._model = pickle.load(file_like_object)
 
-    def predict(self, features: List[List[float]]) -> List[float]:
-        return self._model.predict(features)
+    def predict(self, features: Features) -> List[float]:
+        return self._model.predict(_to_feature_matrix(features))
 
 
 class ZipModel(MLModel):
@@ -135,7 +263,7 @@ class ZipModel(MLModel):
                                 elif hasattr(__main__, attr_name):
                                     delattr(__main__, attr_name)
 
-    def predict(self, features: List[List[float]]) -> List[float]:
+    def predict(self, features: Features) -> List[float]:
         return self._delegate_model.predict(features)
 
     def __del__(self):
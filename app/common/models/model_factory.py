@@ -1,4 +1,11 @@
-from app.common.models.ml_models import MLModel, JoblibModel, PickleModel, ZipModel
+import os
+from app.common.models.ml_models import (
+    MLModel,
+    JoblibModel,
+    LazyJoblibModel,
+    PickleModel,
+    ZipModel,
+)
 from app.common.connectors.model_manager.model_manager_models import ModelMetadata
 
 
@@ -7,14 +14,37 @@ class ModelFactory:
     @staticmethod
     def create_model(metadata: ModelMetadata, file_content: bytes) -> MLModel:
         return ModelFactory.create_model_by_type(
-            metadata.file_type, file_content, metadata
+            metadata.file_type, file_content, metadata, lazy=True
         )
 
+    @staticmethod
+    def create_model_from_file(metadata: ModelMetadata, file_path: str) -> MLModel:
+        """
+        Create a model from a downloaded file. Joblib models take the file over,
+        for other types it is read and removed.
+        """
+        if metadata.file_type == "joblib":
+            return LazyJoblibModel(metadata, file_path=file_path)
+
+        try:
+            with open(file_path, "rb") as model_file:
+                file_content = model_file.read()
+        finally:
+            os.remove(file_path)
+        return ModelFactory.create_model(metadata, file_content)
+
     @staticmethod
     def create_model_by_type(
-        file_type: str, file_content: bytes, metadata: ModelMetadata = None
+        file_type: str,
+        file_content: bytes,
+        metadata: ModelMetadata = None,
+        lazy: bool = False,
     ) -> MLModel:
+        # Zip models load their delegate eagerly, while the classes shipped in the
+        # archive are still importable, so they never ask for a lazy model
         if file_type == "joblib":
+            if lazy:
+                return LazyJoblibModel(metadata, file_content)
             return JoblibModel(metadata, file_content)
         elif file_type in ("pkl", "pickle"):
             return PickleModel(metadata, file_content)
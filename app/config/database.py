@@ -1,7 +1,8 @@
 import os
 import asyncpg
 import logging
-from typing import Optional, List, Any
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, List, Any
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +18,8 @@ class DatabaseConfig:
         self.database = os.getenv("DB_NAME", "solar")
         self.min_connections = int(os.getenv("DB_MIN_CONNECTIONS", "5"))
         self.max_connections = int(os.getenv("DB_MAX_CONNECTIONS", "20"))
+        # Prepared statements cached per pooled connection, keyed by query text
+        self.statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
 
     @property
     def connection_string(self) -> str:
@@ -42,6 +45,7 @@ class DatabaseManager:
                 min_size=self.config.min_connections,
                 max_size=self.config.max_connections,
                 command_timeout=30,
+                statement_cache_size=self.config.statement_cache_size,
             )
             return True
         except Exception as e:
@@ -54,7 +58,11 @@ class DatabaseManager:
             await self.pool.close()
 
     async def execute_many(self, command: str, args_list):
-        """Execute a command with multiple parameter sets"""
+        """
+        Execute a command with multiple parameter sets.
+        The statement is prepared once per connection and reused from the
+        connection's statement cache on later calls with the same query text.
+        """
         async with self.pool.acquire() as connection:
             return await connection.executemany(command, args_list)
 
@@ -63,6 +71,39 @@ class DatabaseManager:
         async with self.pool.acquire() as connection:
             return await connection.fetch(query, *args)
 
+    async def copy_records_ignore_conflicts(
+        self, table: str, columns: List[str], records
+    ) -> None:
+        """
+        Bulk insert records using COPY, skipping rows that conflict with existing ones.
+        COPY has no ON CONFLICT support, so records are copied into a temporary
+        staging table first and moved over with a single INSERT ... SELECT.
+        """
+        staging_table = f"{table}_staging"
+        column_list = ", ".join(columns)
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    f"CREATE TEMP TABLE {staging_table} "
+                    f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await connection.copy_records_to_table(
+                    staging_table, records=records, columns=columns
+                )
+                await connection.execute(
+                    f"INSERT INTO {table} ({column_list}) "
+                    f"SELECT {column_list} FROM {staging_table} "
+                    "ON CONFLICT DO NOTHING"
+                )
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[asyncpg.Connection]:
+        """Acquire a connection and run the enclosed block in a single transaction"""
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                yield connection
+
 
 # Global database manager instance
 db_config = DatabaseConfig()
@@ -1,4 +1,6 @@
 from fastapi import FastAPI, HTTPException, Query, UploadFile, File
+from fastapi.responses import ORJSONResponse
+import orjson
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -45,6 +47,20 @@ logging.basicConfig(
 OPEN_METEO_BASE_URL = "https://api.open-meteo.com/v1/forecast"
 MODEL_MANAGER_BASE_URL = os.getenv("MODEL_MANAGER_BASE_URL", "http://localhost:8000")
 
+
+class ForecastJSONResponse(ORJSONResponse):
+    """orjson response that writes UTC datetimes with a "Z" suffix, like pydantic"""
+
+    def render(self, content) -> bytes:
+        # ORJSONResponse's own options, plus the "Z" suffix
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_SERIALIZE_NUMPY
+            | orjson.OPT_UTC_Z,
+        )
+
+
 model_manager_connector = ModelManagerConnector(base_url=MODEL_MANAGER_BASE_URL)
 state_manager = StateManager(model_manager_connector=model_manager_connector)
 
@@ -89,6 +105,10 @@ async def lifespan(app: FastAPI):
             logging.error("Failed to initialize database connection pool")
             raise RuntimeError("Database initialization failed")
 
+        prediction_repository.start_writer()
+        weather_forecast_repository.start_writer()
+        metrics_service.start_worker()
+
         state_manager.refresh_state()
 
         await prediction_scheduler.start()
@@ -103,12 +123,25 @@ async def lifespan(app: FastAPI):
         # Gracefully stop the prediction scheduler first (it needs database connection)
         await prediction_scheduler.stop()
 
+        # Flush queued writes while the database connection is still open
+        await prediction_repository.stop_writer()
+        await weather_forecast_repository.stop_writer()
+        await metrics_service.stop_worker()
+
+        model_manager_connector.close()
+        open_meteo_connector.close()
+
         await db_manager.close()
     except Exception as e:
         logging.error(f"Shutdown error: {e}")
 
 
-app = FastAPI(title="Solar Prediction Service", version="1.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="Solar Prediction Service",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 @app.get("/")
@@ -122,28 +155,32 @@ async def generate_predictions(start_date: datetime):
     logging.info(f"Triggering prediction process for start date: {start_date}")
 
     try:
-        prediction_service.predict(custom_start_time=start_date)
+        await prediction_service.predict(custom_start_time=start_date)
         return {"message": "Prediction process triggered successfully"}
     except Exception as e:
         logging.error(f"Error triggering prediction: {e}", exc_info=True)
         return {"message": f"Failed to trigger prediction: {str(e)}"}
 
 
-@app.get("/internal/status")
+@app.get("/internal/status", response_class=ORJSONResponse)
 async def get_status():
-    power_plants = state_manager.get_active_power_plants()
-    models = []
-    for power_plant in power_plants:
-        models.append(state_manager.get_active_models_for_power_plant(power_plant.id))
-    return {
-        "service": "Solar Prediction Service",
-        "power_plants": power_plants,
-        "models": models,
-        "prediction_scheduler": prediction_scheduler.get_status(),
-    }
-
-
-@app.get("/forecast/{model_id}", response_model=List[ForecastResponse])
+    # The state summary is serialized once per refresh and embedded as is
+    return ORJSONResponse(
+        {
+            "service": "Solar Prediction Service",
+            **state_manager.get_state_summary_json(),
+            "prediction_scheduler": prediction_scheduler.get_status(),
+        }
+    )
+
+
+@app.get(
+    "/forecast/{model_id}",
+    response_class=ForecastJSONResponse,
+    # The payload is built by _to_forecast_payload and returned as it is, so the
+    # model only documents the response schema
+    responses={200: {"model": List[ForecastResponse]}},
+)
 async def get_forecast(
     model_id: int,
     start_date: datetime = Query(..., description="Start date in ISO 8601 format"),
@@ -167,16 +204,7 @@ async def get_forecast(
             model_id, start_date, end_date
         )
 
-        response = [
-            ForecastResponse(
-                id=row["id"],
-                prediction_time=row["prediction_time"],
-                power_output=row["power_output"],
-            )
-            for row in forecast_data
-        ]
-
-        return response
+        return ForecastJSONResponse(_to_forecast_payload(forecast_data))
 
     except HTTPException:
         raise
@@ -187,7 +215,13 @@ async def get_forecast(
         raise HTTPException(status_code=500, detail="Failed to fetch forecast data")
 
 
-@app.get("/forecast/time_of_forecast/{model_id}", response_model=List[ForecastResponse])
+@app.get(
+    "/forecast/time_of_forecast/{model_id}",
+    response_class=ForecastJSONResponse,
+    # The payload is built by _to_forecast_payload and returned as it is, so the
+    # model only documents the response schema
+    responses={200: {"model": List[ForecastResponse]}},
+)
 async def get_forecast_by_time_of_forecast(
     model_id: int,
     tof: datetime = Query(
@@ -206,16 +240,7 @@ async def get_forecast_by_time_of_forecast(
             )
         )
 
-        response = [
-            ForecastResponse(
-                id=row["id"],
-                prediction_time=row["prediction_time"],
-                power_output=row["power_output"],
-            )
-            for row in forecast_data
-        ]
-
-        return response
+        return ForecastJSONResponse(_to_forecast_payload(forecast_data))
 
     except Exception as e:
         logging.error(
@@ -225,6 +250,18 @@ async def get_forecast_by_time_of_forecast(
         raise HTTPException(status_code=500, detail="Failed to fetch forecast data")
 
 
+def _to_forecast_payload(forecast_data) -> List[dict]:
+    """Build ForecastResponse-shaped dicts straight from the fetched records"""
+    return [
+        {
+            "id": row["id"],
+            "prediction_time": row["prediction_time"],
+            "power_output": row["power_output"],
+        }
+        for row in forecast_data
+    ]
+
+
 @app.get("/forecast/{model_id}/timestamps", response_model=List[datetime])
 async def get_forecast_timestamps(model_id: int):
 
@@ -1,6 +1,7 @@
 import logging
 import math
 from typing import Any, Callable, Dict, List
+import numpy as np
 from app.prediction.weather_forecast.weather_forecast_models import (
     WeatherDataPoint,
     WeatherForecast,
@@ -21,39 +22,51 @@ class DataPreparationService:
     def __init__(self):
         self._feature_calculators: Dict[str, Callable] = {}
         self._register_default_calculators()
+        # Built once, the calculators do not change after registration
+        self._supported_features = frozenset(self._feature_calculators)
 
     def prepare_data(
         self,
         weather_forecast: WeatherForecast,
         model_features: List[str],
         power_plant_capacity: int,
-    ) -> List[List[float]]:
+    ) -> np.ndarray:
+        """
+        Build the model input matrix, one row per data point and one float64
+        column per model feature, in the layout the estimators predict on.
+        """
         try:
             self._validate_features(model_features)
 
-            context = self._prepare_context(weather_forecast, power_plant_capacity)
-
-            formatted_data = []
-            for data_point in weather_forecast.forecast_data:
-                feature_vector = self._calculate_features_for_data_point(
-                    data_point, model_features, context
+            if weather_forecast.forecast_columns:
+                model_inputs = self._prepare_data_by_column(
+                    weather_forecast, model_features, power_plant_capacity
                 )
-                formatted_data.append(feature_vector)
+            else:
+                context = self._prepare_context(weather_forecast, power_plant_capacity)
+                model_inputs = np.array(
+                    [
+                        self._calculate_features_for_data_point(
+                            data_point, model_features, context
+                        )
+                        for data_point in weather_forecast.forecast_data
+                    ],
+                    dtype=np.float64,
+                ).reshape(len(weather_forecast.forecast_data), len(model_features))
 
             logger.debug(
-                f"Prepared {len(formatted_data)} data points with {len(model_features)} features each"
+                "Prepared %d data points with %d features each", *model_inputs.shape
             )
 
-            return formatted_data
+            return model_inputs
 
         except Exception as e:
             logger.error(f"Failed to prepare data: {e}")
             raise
 
     def _validate_features(self, model_features: List[str]) -> None:
-        supported_features = set(self._feature_calculators.keys())
         unsupported_features = [
-            f for f in model_features if f not in supported_features
+            f for f in model_features if f not in self._supported_features
         ]
 
         if unsupported_features:
@@ -61,6 +74,42 @@ class DataPreparationService:
                 f"Unsupported features: {unsupported_features}."
             )
 
+    def _prepare_data_by_column(
+        self,
+        weather_forecast: WeatherForecast,
+        model_features: List[str],
+        power_plant_capacity: int,
+    ) -> np.ndarray:
+        """
+        Build the input matrix one feature column at a time. Weather features
+        are copied from the forecast's columns, with missing values replaced by
+        0.0 in one vectorised step. Other features are calculated per data point.
+        """
+        forecast_columns = weather_forecast.forecast_columns
+        forecast_data = weather_forecast.forecast_data
+        context = self._prepare_context(weather_forecast, power_plant_capacity)
+
+        model_inputs = np.empty((len(forecast_data), len(model_features)))
+        missing_count = 0
+
+        for i, feature_name in enumerate(model_features):
+            column = forecast_columns.get(feature_name)
+            if column is None:
+                model_inputs[:, i] = [
+                    self._calculate_feature(feature_name, data_point, context)
+                    for data_point in forecast_data
+                ]
+                continue
+
+            missing = np.isnan(column)
+            missing_count += int(missing.sum())
+            model_inputs[:, i] = np.where(missing, 0.0, column)
+
+        if missing_count:
+            logger.debug("Missing %d weather feature values, using 0.0", missing_count)
+
+        return model_inputs
+
     def _prepare_context(
         self, weather_forecast: WeatherForecast, power_plant_capacity: int
     ) -> Dict[str, Any]:
@@ -78,30 +127,39 @@ class DataPreparationService:
         model_features: List[str],
         context: Dict[str, Any],
     ) -> List[float]:
-        feature_vector = []
-
-        for feature_name in model_features:
-            try:
-                calculator = self._feature_calculators[feature_name]
-                value = calculator(data_point, context)
-
-                # Handle None values by replacing with 0.0
-                if value is None:
-                    value = 0.0
-                    logger.debug(
-                        f"Missing value for feature '{feature_name}' at time {data_point.time}, using 0.0"
-                    )
-
-                feature_vector.append(float(value))
-
-            except Exception as e:
-                # Failed feature calculations are replaced with 0.0
-                logger.warning(
-                    f"Feature calculation failed for '{feature_name}' at time {data_point.time}: {e}, using 0.0"
+        return [
+            self._calculate_feature(feature_name, data_point, context)
+            for feature_name in model_features
+        ]
+
+    def _calculate_feature(
+        self,
+        feature_name: str,
+        data_point: WeatherDataPoint,
+        context: Dict[str, Any],
+    ) -> float:
+        try:
+            calculator = self._feature_calculators[feature_name]
+            value = calculator(data_point, context)
+
+            # Handle None values by replacing with 0.0
+            if value is None:
+                # Lazy %-formatting, this runs per data point and feature
+                logger.debug(
+                    "Missing value for feature '%s' at time %s, using 0.0",
+                    feature_name,
+                    data_point.time,
                 )
-                feature_vector.append(0.0)
+                return 0.0
 
-        return feature_vector
+            return float(value)
+
+        except Exception as e:
+            # Failed feature calculations are replaced with 0.0
+            logger.warning(
+                f"Feature calculation failed for '{feature_name}' at time {data_point.time}: {e}, using 0.0"
+            )
+            return 0.0
 
     def _register_default_calculators(self) -> None:
         # Direct weather data features
@@ -125,6 +125,44 @@ class MetricsRepository:
             )
             raise
 
+    async def aggregate_horizon_metrics(
+        self, model_id: int, plant_id: int
+    ) -> List[dict]:
+        """
+        Aggregate prediction errors per horizon for a specific model in the database.
+
+        Args:
+            model_id: The model ID
+            plant_id: The power plant ID
+
+        Returns:
+            List of dictionaries with horizon and its mae, rmse and mbe values
+        """
+        query = """
+            SELECT 
+                pp.horizon,
+                AVG(ABS(pp.predicted_power - pr.power_w)) AS mae,
+                SQRT(AVG(POWER(pp.predicted_power - pr.power_w, 2))) AS rmse,
+                AVG(pp.predicted_power - pr.power_w) AS mbe
+            FROM power_predictions pp
+            INNER JOIN power_readings pr ON pp.prediction_time = pr.timestamp 
+                AND pr.plant_id = $2
+            WHERE pp.model_id = $1
+                AND pp.predicted_power IS NOT NULL
+                AND pr.power_w IS NOT NULL
+                AND pp.horizon IN (0.25, 1, 6, 24, 48, 72)
+            GROUP BY pp.horizon
+        """
+
+        try:
+            rows = await db_manager.execute(query, model_id, plant_id)
+            return rows
+        except Exception as e:
+            logger.error(
+                f"Failed to aggregate horizon metrics for model {model_id}: {e}"
+            )
+            raise
+
     async def save_cycle_metrics(
         self, metrics_data: List[Tuple[datetime, int, str, float]]
     ) -> None:
@@ -156,12 +194,13 @@ class MetricsRepository:
             plant_id: The power plant ID
 
         Returns:
-            List of dictionaries containing prediction and actual reading pairs with cycle info
+            List of dictionaries containing prediction and actual reading pairs with cycle and horizon info
         """
         query = """
             SELECT 
                 pp.created_at as time_of_forecast,
                 pp.prediction_time,
+                pp.horizon,
                 pp.predicted_power,
                 pr.power_w as actual_power
             FROM power_predictions pp
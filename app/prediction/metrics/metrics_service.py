@@ -1,5 +1,6 @@
+import asyncio
 import logging
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Set
 from datetime import datetime
 from decimal import Decimal
 import numpy as np
@@ -14,6 +15,12 @@ from app.common.connectors.model_manager.model_manager_connector import (
 
 logger = logging.getLogger(__name__)
 
+# Metric types that aggregate_horizon_metrics computes in the database
+SQL_AGGREGATED_METRIC_TYPES = {"MAE", "RMSE", "MBE"}
+
+# How long shutdown waits for queued metric calculations to finish
+WORKER_DRAIN_TIMEOUT_SECONDS = 60
+
 
 class MetricsService:
     def __init__(
@@ -24,13 +31,82 @@ class MetricsService:
         self._metrics_repository = metrics_repository
         self._model_manager_connector = model_manager_connector
         self._horizon_values = [0.25, 1, 6, 24, 48, 72]
+        self._calculation_queue: asyncio.Queue[int] = asyncio.Queue()
+        self._queued_plant_ids: Set[int] = set()
+        self._running_plant_id: Optional[int] = None
+        self._worker_task: Optional[asyncio.Task] = None
+
+    def start_worker(self) -> None:
+        """Start the background task that runs queued plant metric calculations"""
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._run_worker())
+
+    async def stop_worker(self) -> None:
+        """
+        Run the queued calculations and stop the background worker. Calculations
+        still unfinished after WORKER_DRAIN_TIMEOUT_SECONDS are dropped and logged.
+        """
+        if self._worker_task is None:
+            return
+
+        if not self._worker_task.done():
+            try:
+                await asyncio.wait_for(
+                    self._calculation_queue.join(), WORKER_DRAIN_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+
+        dropped_plant_ids = sorted(self._queued_plant_ids)
+        if self._running_plant_id is not None:
+            dropped_plant_ids.insert(0, self._running_plant_id)
+        if dropped_plant_ids:
+            logger.warning(
+                "Stopping metrics worker, dropping calculations for plants %s",
+                dropped_plant_ids,
+            )
+
+        self._worker_task.cancel()
+        await asyncio.gather(self._worker_task, return_exceptions=True)
+        self._worker_task = None
+
+    def schedule_metrics_calculation(self, plant_id: int) -> None:
+        """
+        Queue a metrics calculation for all models in the power plant.
+        A plant that is already waiting in the queue is not queued again, so
+        consecutive uploads for the same plant result in a single calculation.
+        """
+        if plant_id in self._queued_plant_ids:
+            logger.info("Metrics calculation for plant %s is already queued", plant_id)
+            return
+
+        self._queued_plant_ids.add(plant_id)
+        self._calculation_queue.put_nowait(plant_id)
+        logger.info("Queued metrics calculation for plant %s", plant_id)
+
+    async def _run_worker(self) -> None:
+        while True:
+            plant_id = await self._calculation_queue.get()
+            # Uploads arriving from now on need a new run to include their readings
+            self._queued_plant_ids.discard(plant_id)
+
+            self._running_plant_id = plant_id
+            try:
+                await self.calculate_all_metrics_by_plant(plant_id)
+            except Exception as e:
+                logger.error(
+                    "Queued metrics calculation failed for plant %s: %s", plant_id, e
+                )
+            finally:
+                self._running_plant_id = None
+                self._calculation_queue.task_done()
 
     async def get_horizon_metric_types(self) -> List[str]:
         try:
             metric_types = await self._metrics_repository.get_horizon_metric_types()
             return metric_types
         except Exception as e:
-            logger.error(f"Error fetching horizon metric types: {e}")
+            logger.error("Error fetching horizon metric types: %s", e)
             raise
 
     async def get_cycle_metric_types(self) -> List[str]:
@@ -38,7 +114,7 @@ class MetricsService:
             metric_types = await self._metrics_repository.get_cycle_metric_types()
             return metric_types
         except Exception as e:
-            logger.error(f"Error fetching cycle metric types: {e}")
+            logger.error("Error fetching cycle metric types: %s", e)
             raise
 
     async def get_horizon_metrics(self, model_id: int) -> List[HorizonMetric]:
@@ -55,7 +131,7 @@ class MetricsService:
 
             return metrics
         except Exception as e:
-            logger.error(f"Error fetching horizon metrics for model {model_id}: {e}")
+            logger.error("Error fetching horizon metrics for model %s: %s", model_id, e)
             raise
 
     async def get_cycle_metrics(
@@ -76,7 +152,7 @@ class MetricsService:
 
             return metrics
         except Exception as e:
-            logger.error(f"Error fetching cycle metrics for model {model_id}: {e}")
+            logger.error("Error fetching cycle metrics for model %s: %s", model_id, e)
             raise
 
     async def calculate_horizon_metrics_by_model(self, model_id: int) -> None:
@@ -84,76 +160,138 @@ class MetricsService:
             metric_types = await self._metrics_repository.get_horizon_metric_types()
             model = self._model_manager_connector.fetch_model(model_id)
 
-            data = (
-                await self._metrics_repository.get_predictions_and_readings_for_model(
-                    model_id, model.plant_id
+            if set(metric_types) <= SQL_AGGREGATED_METRIC_TYPES:
+                horizon_metrics = await self._aggregate_horizon_metrics(
+                    model_id, model.plant_id, metric_types
+                )
+            else:
+                horizon_metrics = await self._compute_horizon_metrics(
+                    model_id, model.plant_id, metric_types
                 )
-            )
 
-            if not data:
+            if not horizon_metrics:
                 logger.warning(
-                    f"No data found for model {model_id} and plant {model.plant_id}"
+                    "No data found for model %s and plant %s", model_id, model.plant_id
                 )
                 return
 
-            horizon_data = self._group_data_by_horizon(data)
-
-            metrics_to_save = []
-            for horizon in self._horizon_values:
-                if horizon not in horizon_data:
-                    logger.warning(
-                        f"No data for horizon {horizon} for model {model_id}"
-                    )
-                    continue
-
-                horizon_predictions = horizon_data[horizon]
-                predicted_values = [
-                    row["predicted_power"] for row in horizon_predictions
-                ]
-                actual_values = [row["actual_power"] for row in horizon_predictions]
-
-                for metric_type in metric_types:
-                    metric_value = self.calculate_metric(
-                        metric_type, predicted_values, actual_values
-                    )
-                    metrics_to_save.append(
-                        (model_id, metric_type, horizon, metric_value)
-                    )
-
-            if metrics_to_save:
-                await self._metrics_repository.save_horizon_metrics(metrics_to_save)
-                logger.info(
-                    f"Calculated and saved {len(metrics_to_save)} horizon metrics for model {model_id}"
-                )
-            else:
-                logger.warning(f"No metrics calculated for model {model_id}")
+            await self._save_horizon_metrics(model_id, horizon_metrics)
 
         except Exception as e:
-            logger.error(f"Error calculating horizon metrics for model {model_id}: {e}")
+            logger.error(
+                "Error calculating horizon metrics for model %s: %s", model_id, e
+            )
             raise
 
-    async def calculate_horizon_metrics_by_plant(self, plant_id: int) -> None:
+    async def _aggregate_horizon_metrics(
+        self, model_id: int, plant_id: int, metric_types: List[str]
+    ) -> Dict[float, Dict[str, float]]:
+        rows = await self._metrics_repository.aggregate_horizon_metrics(
+            model_id, plant_id
+        )
+
+        return {
+            float(row["horizon"]): {
+                metric_type: float(row[metric_type.lower()])
+                for metric_type in metric_types
+            }
+            for row in rows
+        }
+
+    async def _compute_horizon_metrics(
+        self, model_id: int, plant_id: int, metric_types: List[str]
+    ) -> Dict[float, Dict[str, float]]:
+        data = await self._metrics_repository.get_predictions_and_readings_for_model(
+            model_id, plant_id
+        )
+
+        return self._calculate_grouped_metrics(
+            self._group_data_by_horizon(data), metric_types
+        )
+
+    async def _save_horizon_metrics(
+        self, model_id: int, horizon_metrics: Dict[float, Dict[str, float]]
+    ) -> None:
+        metrics_to_save = []
+        for horizon in self._horizon_values:
+            if horizon not in horizon_metrics:
+                logger.warning("No data for horizon %s for model %s", horizon, model_id)
+                continue
+
+            for metric_type, metric_value in horizon_metrics[horizon].items():
+                metrics_to_save.append((model_id, metric_type, horizon, metric_value))
+
+        if metrics_to_save:
+            await self._metrics_repository.save_horizon_metrics(metrics_to_save)
+            logger.info(
+                "Calculated and saved %s horizon metrics for model %s",
+                len(metrics_to_save),
+                model_id,
+            )
+        else:
+            logger.warning("No metrics calculated for model %s", model_id)
+
+    async def calculate_all_metrics_by_plant(self, plant_id: int) -> None:
+        """
+        Calculate horizon and cycle metrics for all models in the power plant.
+        Predictions and readings are fetched once per model and both metric
+        families are derived from the same rows.
+        """
         try:
             models = self._model_manager_connector.fetch_models_for_power_plant(
                 plant_id
             )
 
             if not models:
-                logger.warning(f"No models found for plant {plant_id}")
+                logger.warning("No models found for plant %s", plant_id)
                 return
 
+            horizon_metric_types = (
+                await self._metrics_repository.get_horizon_metric_types()
+            )
+            cycle_metric_types = await self._metrics_repository.get_cycle_metric_types()
+            horizon_values = set(self._horizon_values)
+
             for model in models:
                 logger.info(
-                    f"Calculating metrics for model {model.id} in plant {plant_id}"
+                    "Calculating metrics for model %s in plant %s", model.id, plant_id
+                )
+                data = (
+                    await self._metrics_repository.get_predictions_and_readings_by_cycle(
+                        model.id, plant_id
+                    )
+                )
+
+                if not data:
+                    logger.warning(
+                        "No data found for model %s and plant %s", model.id, plant_id
+                    )
+                    continue
+
+                # The rows are already here, so horizon metrics are computed from
+                # them rather than by a second join in the database
+                horizon_data = self._group_data_by_horizon(
+                    [row for row in data if float(row["horizon"]) in horizon_values]
+                )
+                await self._save_horizon_metrics(
+                    model.id,
+                    self._calculate_grouped_metrics(horizon_data, horizon_metric_types),
+                )
+                await self._save_cycle_metrics(
+                    model.id,
+                    self._calculate_grouped_metrics(
+                        self._group_data_by_cycle(data), cycle_metric_types
+                    ),
                 )
-                await self.calculate_horizon_metrics_by_model(model.id)
 
             logger.info(
-                f"Completed calculating horizon metrics for {len(models)} models in plant {plant_id}"
+                "Completed calculating metrics for %s models in plant %s",
+                len(models),
+                plant_id,
             )
 
         except Exception as e:
-            logger.error(f"Error calculating horizon metrics for plant {plant_id}: {e}")
+            logger.error("Error calculating metrics for plant %s: %s", plant_id, e)
             raise
 
     async def calculate_cycle_metrics_by_model(self, model_id: int) -> None:
@@ -167,60 +305,58 @@ class MetricsService:
 
             if not data:
                 logger.warning(
-                    f"No data found for model {model_id} and plant {model.plant_id}"
+                    "No data found for model %s and plant %s", model_id, model.plant_id
                 )
                 return
 
-            cycle_data = self._group_data_by_cycle(data)
-
-            metrics_to_save = []
-            for time_of_forecast, cycle_predictions in cycle_data.items():
-                predicted_values = [row["predicted_power"] for row in cycle_predictions]
-                actual_values = [row["actual_power"] for row in cycle_predictions]
-
-                for metric_type in metric_types:
-                    metric_value = self.calculate_metric(
-                        metric_type, predicted_values, actual_values
-                    )
-                    metrics_to_save.append(
-                        (time_of_forecast, model_id, metric_type, metric_value)
-                    )
-
-            if metrics_to_save:
-                await self._metrics_repository.save_cycle_metrics(metrics_to_save)
-                logger.info(
-                    f"Calculated and saved {len(metrics_to_save)} cycle metrics for model {model_id}"
-                )
-            else:
-                logger.warning(f"No cycle metrics calculated for model {model_id}")
+            await self._save_cycle_metrics(
+                model_id,
+                self._calculate_grouped_metrics(
+                    self._group_data_by_cycle(data), metric_types
+                ),
+            )
 
         except Exception as e:
-            logger.error(f"Error calculating cycle metrics for model {model_id}: {e}")
-            raise
-
-    async def calculate_cycle_metrics_by_plant(self, plant_id: int) -> None:
-        try:
-            models = self._model_manager_connector.fetch_models_for_power_plant(
-                plant_id
+            logger.error(
+                "Error calculating cycle metrics for model %s: %s", model_id, e
             )
+            raise
 
-            if not models:
-                logger.warning(f"No models found for plant {plant_id}")
-                return
-
-            for model in models:
-                logger.info(
-                    f"Calculating cycle metrics for model {model.id} in plant {plant_id}"
-                )
-                await self.calculate_cycle_metrics_by_model(model.id)
-
+    async def _save_cycle_metrics(
+        self, model_id: int, cycle_metrics: Dict[datetime, Dict[str, float]]
+    ) -> None:
+        metrics_to_save = [
+            (time_of_forecast, model_id, metric_type, metric_value)
+            for time_of_forecast, metrics in cycle_metrics.items()
+            for metric_type, metric_value in metrics.items()
+        ]
+
+        if metrics_to_save:
+            await self._metrics_repository.save_cycle_metrics(metrics_to_save)
             logger.info(
-                f"Completed calculating cycle metrics for {len(models)} models in plant {plant_id}"
+                "Calculated and saved %s cycle metrics for model %s",
+                len(metrics_to_save),
+                model_id,
             )
+        else:
+            logger.warning("No cycle metrics calculated for model %s", model_id)
+
+    def _calculate_grouped_metrics(
+        self, grouped_data: Dict[Any, List[dict]], metric_types: List[str]
+    ) -> Dict[Any, Dict[str, float]]:
+        grouped_metrics = {}
+        for key, rows in grouped_data.items():
+            predicted_values = [row["predicted_power"] for row in rows]
+            actual_values = [row["actual_power"] for row in rows]
+
+            grouped_metrics[key] = {
+                metric_type: self.calculate_metric(
+                    metric_type, predicted_values, actual_values
+                )
+                for metric_type in metric_types
+            }
 
-        except Exception as e:
-            logger.error(f"Error calculating cycle metrics for plant {plant_id}: {e}")
-            raise
+        return grouped_metrics
 
     def _group_data_by_cycle(self, data: List[dict]) -> Dict[datetime, List[dict]]:
         cycle_data = {}
@@ -1,7 +1,9 @@
+import asyncio
 import logging
 import csv
 import io
-from typing import List, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from fastapi import UploadFile
 from app.prediction.playground.playground_models import (
@@ -14,13 +16,17 @@ from app.prediction.playground.playground_models import (
 from app.common.connectors.model_manager.model_manager_connector import (
     ModelManagerConnector,
 )
-
+from app.common.connectors.model_manager.model_manager_models import Model
+from app.common.models.ml_models import MLModel
 from app.common.models.model_factory import ModelFactory
 from app.prediction.metrics.metrics_service import MetricsService
 from app.prediction.power_readings.power_readings_service import PowerReadingsService
 
 logger = logging.getLogger(__name__)
 
+MAX_VALIDATION_ERRORS = 50
+MODEL_CACHE_SIZE = 8
+
 
 class PlaygroundService:
 
@@ -33,6 +39,10 @@ class PlaygroundService:
         self._model_manager_connector = model_manager_connector
         self._metrics_service = metrics_service
         self._power_readings_service = power_readings_service
+        self._model_cache: OrderedDict[Tuple[int, int], MLModel] = OrderedDict()
+        # Models being downloaded, so concurrent misses on a key share one load.
+        # Both dicts are only touched on the event loop, between awaits.
+        self._model_loads: Dict[Tuple[int, int], asyncio.Task] = {}
 
     def get_model_features(self, model_id: int) -> Optional[PlaygroundFeatureInfo]:
         """Get model features and metadata for playground use"""
@@ -71,9 +81,9 @@ class PlaygroundService:
                     validation_errors=["Model not found"],
                 )
 
-            # Download and create ML model
-            model_file = self._model_manager_connector.download_model_file(model_id)
-            if not model_file:
+            # Download and create ML model, reusing a cached one if available
+            ml_model = await self._get_ml_model(model_metadata)
+            if not ml_model:
                 return PlaygroundPredictionResponse(
                     model_id=model_id,
                     predictions=[],
@@ -84,8 +94,6 @@ class PlaygroundService:
                     validation_errors=["Model file not available"],
                 )
 
-            ml_model = ModelFactory.create_model(model_metadata, model_file)
-
             # Check file size (max 100MB)
             file_size_mb = 100
             max_file_size = file_size_mb * 1024 * 1024  # 100MB in bytes
@@ -160,6 +168,51 @@ class PlaygroundService:
                 ],
             )
 
+    async def _get_ml_model(self, model_metadata: Model) -> Optional[MLModel]:
+        """Get the ML model for the given metadata, downloading it only on cache miss"""
+        cache_key = (model_metadata.id, model_metadata.version)
+
+        ml_model = self._model_cache.get(cache_key)
+        if ml_model is not None:
+            self._model_cache.move_to_end(cache_key)
+            return ml_model
+
+        model_load = self._model_loads.get(cache_key)
+        if model_load is None:
+            model_load = asyncio.create_task(
+                self._load_ml_model(cache_key, model_metadata)
+            )
+            self._model_loads[cache_key] = model_load
+
+        # Shielded so a cancelled request does not cancel a load others wait for
+        return await asyncio.shield(model_load)
+
+    async def _load_ml_model(
+        self, cache_key: Tuple[int, int], model_metadata: Model
+    ) -> Optional[MLModel]:
+        try:
+            # Downloading and unpickling block, so they run in a worker thread
+            ml_model = await asyncio.to_thread(self._create_ml_model, model_metadata)
+            if ml_model is not None:
+                self._model_cache[cache_key] = ml_model
+                if len(self._model_cache) > MODEL_CACHE_SIZE:
+                    self._model_cache.popitem(last=False)
+            return ml_model
+        finally:
+            del self._model_loads[cache_key]
+
+    def _create_ml_model(self, model_metadata: Model) -> Optional[MLModel]:
+        model_file = self._model_manager_connector.download_model_file(
+            model_metadata.id
+        )
+        if not model_file:
+            return None
+
+        ml_model = ModelFactory.create_model(model_metadata, model_file)
+        # Load a lazy model here too, rather than in predict on the event loop
+        ml_model.warm_up()
+        return ml_model
+
     async def _validate_csv(
         self, file: UploadFile, required_features: List[str]
     ) -> CSVValidationResult:
@@ -168,11 +221,13 @@ class PlaygroundService:
             content = await file.read()
             content_str = content.decode("utf-8")
 
-            # Parse CSV
-            csv_reader = csv.DictReader(io.StringIO(content_str))
+            # Parse CSV, skipping blank lines
+            csv_reader = csv.reader(io.StringIO(content_str))
+            csv_rows = (row for row in csv_reader if row)
+            header = next(csv_rows, None)
 
             # Check if headers exist
-            if not csv_reader.fieldnames:
+            if not header:
                 return CSVValidationResult(
                     is_valid=False,
                     errors=["CSV file is empty or has no headers"],
@@ -182,13 +237,12 @@ class PlaygroundService:
                 )
 
             # Check for exact match of columns (timestamp + features)
-            expected_columns = ["timestamp"] + required_features
-            csv_columns = list(csv_reader.fieldnames)
+            expected_columns = ("timestamp", *required_features)
+            csv_columns = tuple(header)
 
             if csv_columns != expected_columns:
                 missing_columns = set(expected_columns) - set(csv_columns)
                 extra_columns = set(csv_columns) - set(expected_columns)
-                wrong_order = csv_columns != expected_columns
 
                 errors = []
                 if missing_columns:
@@ -197,9 +251,10 @@ class PlaygroundService:
                     )
                 if extra_columns:
                     errors.append(f"Unexpected columns: {sorted(extra_columns)}")
-                if wrong_order and not missing_columns and not extra_columns:
+                if not missing_columns and not extra_columns:
+                    # Same columns as expected, so the mismatch is the ordering
                     errors.append(
-                        f"Columns are in wrong order. Expected order: {expected_columns}"
+                        f"Columns are in wrong order. Expected order: {list(expected_columns)}"
                     )
 
                 return CSVValidationResult(
@@ -216,18 +271,34 @@ class PlaygroundService:
             row_count = 0
             errors = []
 
-            for row_num, row in enumerate(csv_reader, start=1):
+            # Bind the per-cell parsers locally to skip global lookups in the row loop
+            parse_timestamp = datetime.fromisoformat
+            parse_float = float
+            column_count = len(expected_columns)
+            # Without a derived datetime feature every feature column is numeric, so
+            # a whole row can be converted with a single map(float, ...) call
+            convert_whole_row = "datetime" not in required_features
+
+            for row_num, row in enumerate(csv_rows, start=1):
+                # Each row adds at most one error, so validation goes on until one
+                # error more than the cap shows that errors are being dropped
+                if len(errors) > MAX_VALIDATION_ERRORS:
+                    break
+
                 try:
+                    # Short rows are treated as having empty trailing values
+                    if len(row) < column_count:
+                        row += [""] * (column_count - len(row))
+
                     # Parse timestamp
-                    timestamp_str = row["timestamp"]
+                    timestamp_str = row[0]
                     if not timestamp_str:
                         errors.append(f"Row {row_num}: Missing timestamp")
                         continue
 
                     try:
-                        timestamp = datetime.fromisoformat(
-                            timestamp_str.replace("Z", "+00:00")
-                        )
+                        # Python 3.11+ parses a trailing "Z" natively
+                        timestamp = parse_timestamp(timestamp_str)
                         timestamps.append(timestamp)
                     except ValueError:
                         errors.append(
@@ -236,32 +307,33 @@ class PlaygroundService:
                         continue
 
                     # Extract features in the exact order required by the model
-                    feature_vector = []
-                    for feature in required_features:
-                        value = row[feature]
-                        if feature == "datetime":
-                            feature_vector.append(timestamp.timestamp())
-                            continue
-                        if value is None or value == "":
-                            errors.append(
-                                f"Row {row_num}: Missing value for feature '{feature}'"
-                            )
-                            break
+                    values = row[1:column_count]
+                    feature_vector = None
+                    if convert_whole_row:
                         try:
-                            feature_vector.append(float(value))
+                            feature_vector = list(map(parse_float, values))
                         except ValueError:
-                            errors.append(
-                                f"Row {row_num}: Invalid numeric value '{value}' for feature '{feature}'"
-                            )
-                            break
+                            pass
 
-                    if len(feature_vector) == len(required_features):
-                        feature_data.append(feature_vector)
-                        row_count += 1
+                    if feature_vector is None:
+                        feature_vector = self._parse_feature_values(
+                            row_num, values, required_features, timestamp, errors
+                        )
+                        if feature_vector is None:
+                            continue
+
+                    feature_data.append(feature_vector)
+                    row_count += 1
 
                 except Exception as e:
                     errors.append(f"Row {row_num}: Error processing row: {str(e)}")
 
+            if len(errors) > MAX_VALIDATION_ERRORS:
+                errors[MAX_VALIDATION_ERRORS:] = [
+                    f"Validation stopped after {MAX_VALIDATION_ERRORS} errors, "
+                    "remaining rows were not checked"
+                ]
+
             if errors:
                 return CSVValidationResult(
                     is_valid=False,
@@ -307,6 +379,33 @@ class PlaygroundService:
                 row_count=0,
             )
 
+    def _parse_feature_values(
+        self,
+        row_num: int,
+        values: List[str],
+        required_features: List[str],
+        timestamp: datetime,
+        errors: List[str],
+    ) -> Optional[List[float]]:
+        """Convert feature values one by one, recording the first invalid value"""
+        feature_vector = []
+        for feature, value in zip(required_features, values):
+            if feature == "datetime":
+                feature_vector.append(timestamp.timestamp())
+                continue
+            if value == "":
+                errors.append(f"Row {row_num}: Missing value for feature '{feature}'")
+                return None
+            try:
+                feature_vector.append(float(value))
+            except ValueError:
+                errors.append(
+                    f"Row {row_num}: Invalid numeric value '{value}' for feature '{feature}'"
+                )
+                return None
+
+        return feature_vector
+
     async def _calculate_metrics_for_predictions(
         self, plant_id: int, timestamps: List[datetime], predictions: List[float]
     ) -> List[PlaygroundMetric]:
@@ -319,22 +418,17 @@ class PlaygroundService:
             start_date = min(timestamps)
             end_date = max(timestamps)
 
-            # Fetch power readings for the plant
-            power_readings = await self._power_readings_service.get_power_readings(
+            # Fetch timestamp to reading mapping for the plant
+            readings_map = await self._power_readings_service.get_power_readings_map(
                 plant_id, start_date, end_date
             )
 
-            if not power_readings:
+            if not readings_map:
                 logger.warning(
                     f"No power readings found for plant {plant_id} in date range {start_date} to {end_date}"
                 )
                 return []
 
-            # Create timestamp to reading mapping
-            readings_map = {
-                reading.timestamp: reading.power_w for reading in power_readings
-            }
-
             # Match predictions with actual readings
             matched_predictions = []
             matched_actuals = []
@@ -12,9 +12,4 @@ class CSVUploadResponse(BaseModel):
     success: bool
     message: str
     validation_errors: Optional[List[str]] = None
-
-
-class CSVValidationResult(BaseModel):
-    is_valid: bool
-    errors: List[str]
-    readings: List[PowerReading]
+    metrics_status: Optional[str] = None
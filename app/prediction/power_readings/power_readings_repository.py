@@ -1,6 +1,7 @@
 import logging
-from typing import List
+from typing import Dict, List, Optional
 from datetime import datetime
+import asyncpg
 from app.prediction.power_readings.power_readings_models import PowerReading
 from app.config.database import db_manager
 
@@ -42,11 +43,43 @@ class PowerReadingsRepository:
             logger.error(f"Failed to fetch power readings for plant {plant_id}: {e}")
             raise
 
+    async def get_power_readings_map(
+        self, plant_id: int, start_date: datetime, end_date: datetime
+    ) -> Dict[datetime, float]:
+        """
+        Fetch power readings for a specific plant within a date range as a
+        timestamp to power mapping, skipping PowerReading model construction.
+        """
+        query = """
+            SELECT timestamp, power_w
+            FROM power_readings
+            WHERE plant_id = $1 
+            AND timestamp >= $2 
+            AND timestamp <= $3
+        """
+
+        try:
+            rows = await db_manager.execute(query, plant_id, start_date, end_date)
+            return {row["timestamp"]: row["power_w"] for row in rows}
+        except Exception as e:
+            logger.error(f"Failed to fetch power readings for plant {plant_id}: {e}")
+            raise
+
+    def transaction(self):
+        """
+        Open a transaction whose connection can be passed to save_power_readings_batch.
+        """
+        return db_manager.transaction()
+
     async def save_power_readings_batch(
-        self, readings: List[PowerReading], plant_id: int
+        self,
+        readings: List[PowerReading],
+        plant_id: int,
+        connection: Optional[asyncpg.Connection] = None,
     ) -> int:
         """
         Save a batch of power readings for a specific plant.
+        When a connection is given, the batch is written as part of its transaction.
         Returns the number of successfully inserted rows.
         """
         if not readings:
@@ -62,7 +95,10 @@ class PowerReadingsRepository:
                 )
                 reading_records.append(record)
 
-            await db_manager.execute_many(self.insert_query, reading_records)
+            if connection is None:
+                await db_manager.execute_many(self.insert_query, reading_records)
+            else:
+                await connection.executemany(self.insert_query, reading_records)
             logger.info(
                 f"Successfully saved {len(readings)} power readings for plant {plant_id}"
             )
@@ -1,12 +1,14 @@
+import asyncio
 import csv
 import io
 import logging
-from typing import Set, List
+from typing import BinaryIO, Dict, Iterator, Optional, Set, List, Tuple
 from datetime import datetime
+import numpy as np
+import pandas as pd
 from fastapi import UploadFile
 from app.prediction.power_readings.power_readings_models import (
     PowerReading,
-    CSVValidationResult,
     CSVUploadResponse,
 )
 from app.prediction.power_readings.power_readings_repository import (
@@ -16,6 +18,16 @@ from app.prediction.metrics.metrics_service import MetricsService
 
 logger = logging.getLogger(__name__)
 
+READINGS_BATCH_SIZE = 5000
+MAX_VALIDATION_ERRORS = 50
+
+# ISO 8601 timestamps that end in a UTC offset after the time, e.g. "Z" or "+01:00"
+UTC_OFFSET_PATTERN = r"[T ].*(?:Z|[+-]\d{2}(?::?\d{2})*)$"
+
+
+class CSVValidationError(Exception):
+    pass
+
 
 class PowerReadingsService:
 
@@ -35,6 +47,16 @@ class PowerReadingsService:
         """
         return await self._repository.get_power_readings(plant_id, start_date, end_date)
 
+    async def get_power_readings_map(
+        self, plant_id: int, start_date: datetime, end_date: datetime
+    ) -> Dict[datetime, float]:
+        """
+        Get power readings for a specific plant within a date range, keyed by timestamp.
+        """
+        return await self._repository.get_power_readings_map(
+            plant_id, start_date, end_date
+        )
+
     async def upload_csv_readings(
         self, file: UploadFile, plant_id: int
     ) -> CSVUploadResponse:
@@ -42,30 +64,26 @@ class PowerReadingsService:
         Upload and process CSV file containing power readings.
         """
         try:
-            validation_result = await self._validate_and_parse_csv(file)
+            errors: List[str] = []
 
-            if not validation_result.is_valid:
+            try:
+                saved_count = await self._save_csv_readings_in_batches(
+                    file.file, plant_id, errors
+                )
+            except CSVValidationError:
                 return CSVUploadResponse(
                     success=False,
                     message="CSV validation failed",
-                    validation_errors=validation_result.errors,
+                    validation_errors=errors,
                 )
 
-            await self._repository.save_power_readings_batch(
-                validation_result.readings, plant_id
-            )
-
-            try:
-                await self._trigger_metrics_calculation(plant_id)
-                logger.info(
-                    f"Successfully completed metric calculation for plant {plant_id}"
-                )
-            except Exception as e:
-                logger.error(f"Failed to calculate metrics for plant {plant_id}: {e}")
+            # Metrics are recalculated in the background so the upload does not wait
+            self._metrics_service.schedule_metrics_calculation(plant_id)
 
             return CSVUploadResponse(
                 success=True,
-                message=f"Successfully uploaded {len(validation_result.readings)} power readings",
+                message=f"Successfully uploaded {saved_count} power readings",
+                metrics_status="queued",
             )
 
         except Exception as e:
@@ -75,72 +93,108 @@ class PowerReadingsService:
                 message="Failed to save CSV",
             )
 
-    async def _trigger_metrics_calculation(self, plant_id: int) -> None:
+    async def _save_csv_readings_in_batches(
+        self, csv_file: BinaryIO, plant_id: int, errors: List[str]
+    ) -> int:
         """
-        Trigger metric calculations for all models in the power plant.
+        Parse the CSV in batches and save them in a single transaction.
+
+        The next batch is parsed on a worker thread while the previous one is being
+        written, so parsing and database latency overlap. Once a validation error
+        is found no further batches are written and the transaction is rolled back.
         """
-        try:
-            # Calculate horizon metrics for all models in the plant
-            await self._metrics_service.calculate_horizon_metrics_by_plant(plant_id)
-            logger.info(f"Completed horizon metrics calculation for plant {plant_id}")
+        batches = self._parse_csv_batches(csv_file, errors)
+        saved_count = 0
+        pending_save: Optional[asyncio.Task] = None
 
-            # Calculate cycle metrics for all models in the plant
-            await self._metrics_service.calculate_cycle_metrics_by_plant(plant_id)
-            logger.info(f"Completed cycle metrics calculation for plant {plant_id}")
+        async with self._repository.transaction() as connection:
+            try:
+                while True:
+                    batch = await asyncio.to_thread(next, batches, None)
 
-        except Exception as e:
-            logger.error(f"Error during metrics calculation for plant {plant_id}: {e}")
-            raise
+                    if pending_save is not None:
+                        saved_count += await pending_save
+                        pending_save = None
+
+                    if batch is None:
+                        break
+
+                    if not errors:
+                        pending_save = asyncio.create_task(
+                            self._repository.save_power_readings_batch(
+                                batch, plant_id, connection
+                            )
+                        )
+            finally:
+                if pending_save is not None and not pending_save.done():
+                    pending_save.cancel()
+                    await asyncio.gather(pending_save, return_exceptions=True)
+
+            if errors:
+                raise CSVValidationError(f"{len(errors)} invalid rows")
 
-    async def _validate_and_parse_csv(self, file: UploadFile) -> CSVValidationResult:
+        return saved_count
+
+    def _parse_csv_batches(
+        self, csv_file: BinaryIO, errors: List[str]
+    ) -> Iterator[List[PowerReading]]:
         """
-        Validate and parse CSV file content.
+        Validate and parse CSV file content, yielding readings in batches.
+        The file is decoded as it is read instead of being loaded into memory.
+        Validation errors are appended to errors instead of being raised.
         """
-        errors = []
-        readings = []
+        # Timestamps already seen in earlier batches
         seen_timestamps: Set[datetime] = set()
+        row_numbers: List[int] = []
+        timestamp_strs: List[str] = []
+        power_strs: List[str] = []
+        # Errors of the current batch with their row numbers, reported in row
+        # order together with the batch's parse errors
+        row_errors: List[Tuple[int, str]] = []
 
-        try:
-            content = await file.read()
-            content_str = content.decode("utf-8")
+        csv_text = io.TextIOWrapper(csv_file, encoding="utf-8", newline="")
 
-            csv_reader = csv.reader(io.StringIO(content_str))
+        try:
+            csv_reader = csv.reader(csv_text)
 
             for row_number, row in enumerate(csv_reader, start=1):
+                # Reading goes on until an invalid row is known to be dropped,
+                # so the notice about dropped errors is only added when true
+                if len(errors) + len(row_errors) > MAX_VALIDATION_ERRORS:
+                    break
+
                 if len(row) != 2:
-                    errors.append(
-                        f"Row {row_number}: Expected 2 columns, got {len(row)}"
-                    )
+                    message = f"Row {row_number}: Expected 2 columns, got {len(row)}"
+                    row_errors.append((row_number, message))
                     continue
 
-                timestamp_str, power_str = row
-
-                try:
-                    timestamp = datetime.fromisoformat(
-                        timestamp_str.replace("Z", "+00:00")
-                    )
-                except ValueError:
-                    errors.append(
-                        f"Row {row_number}: Invalid timestamp format '{timestamp_str}'"
-                    )
-                    continue
+                row_numbers.append(row_number)
+                timestamp_strs.append(row[0])
+                power_strs.append(row[1])
 
-                if timestamp in seen_timestamps:
-                    errors.append(
-                        f"Row {row_number}: Duplicate timestamp '{timestamp_str}'"
+                if len(row_numbers) >= READINGS_BATCH_SIZE:
+                    yield self._parse_readings_batch(
+                        row_numbers,
+                        timestamp_strs,
+                        power_strs,
+                        seen_timestamps,
+                        row_errors,
+                        errors,
                     )
-                    continue
-                seen_timestamps.add(timestamp)
+                    row_numbers, timestamp_strs, power_strs = [], [], []
+                    row_errors = []
 
-                try:
-                    power_w = float(power_str)
-                except ValueError:
-                    errors.append(
-                        f"Row {row_number}: Invalid power value '{power_str}'"
-                    )
-                    continue
-
-                readings.append(PowerReading(timestamp=timestamp, power_w=power_w))
+            if row_numbers and len(errors) <= MAX_VALIDATION_ERRORS:
+                yield self._parse_readings_batch(
+                    row_numbers,
+                    timestamp_strs,
+                    power_strs,
+                    seen_timestamps,
+                    row_errors,
+                    errors,
+                )
+            else:
+                self._add_row_errors(errors, row_errors)
 
         except UnicodeDecodeError:
             errors.append(
@@ -152,9 +206,139 @@ class PowerReadingsService:
             errors.append(
                 "Unable to read the CSV file. Please check that the file is not corrupted and try again."
             )
+        finally:
+            # Detach so the wrapper does not close the underlying upload file
+            csv_text.detach()
 
-        return CSVValidationResult(
-            is_valid=len(errors) == 0,
-            errors=errors,
-            readings=readings,
+    def _parse_readings_batch(
+        self,
+        row_numbers: List[int],
+        timestamp_strs: List[str],
+        power_strs: List[str],
+        seen_timestamps: Set[datetime],
+        row_errors: List[Tuple[int, str]],
+        errors: List[str],
+    ) -> List[PowerReading]:
+        """
+        Parse one batch of CSV columns with vectorized pandas conversions.
+        Invalid rows are reported in errors, in row order together with the
+        batch's row_errors, and valid rows are returned as readings.
+        """
+        timestamps = self._parse_timestamps(timestamp_strs)
+        power_values = pd.to_numeric(power_strs, errors="coerce").astype(float)
+
+        invalid_timestamps = np.array(
+            [timestamp is None for timestamp in timestamps], dtype=bool
         )
+        duplicate_timestamps = np.zeros(len(timestamps), dtype=bool)
+        for i, timestamp in enumerate(timestamps):
+            if timestamp is None:
+                continue
+            if timestamp in seen_timestamps:
+                duplicate_timestamps[i] = True
+            else:
+                seen_timestamps.add(timestamp)
+        # Like unparsable values, "nan" and "inf" are rejected, as they would
+        # poison every metric calculated from the readings
+        invalid_powers = ~np.isfinite(power_values)
+        invalid_rows = invalid_timestamps | duplicate_timestamps | invalid_powers
+
+        # One more than fits, so _add_row_errors can tell that errors were dropped
+        remaining_errors = max(MAX_VALIDATION_ERRORS - len(errors), 0)
+        for i in np.flatnonzero(invalid_rows)[: remaining_errors + 1]:
+            row_number = row_numbers[i]
+            if invalid_timestamps[i]:
+                message = (
+                    f"Row {row_number}: Invalid timestamp format '{timestamp_strs[i]}'"
+                )
+            elif duplicate_timestamps[i]:
+                message = f"Row {row_number}: Duplicate timestamp '{timestamp_strs[i]}'"
+            else:
+                message = f"Row {row_number}: Invalid power value '{power_strs[i]}'"
+            row_errors.append((row_number, message))
+
+        self._add_row_errors(errors, row_errors)
+
+        # Nothing gets saved once the file is known to be invalid
+        if errors:
+            return []
+
+        valid_rows = ~invalid_rows
+        return [
+            PowerReading(timestamp=timestamps[i], power_w=power_w)
+            for i, power_w in zip(
+                np.flatnonzero(valid_rows).tolist(),
+                power_values[valid_rows].tolist(),
+            )
+        ]
+
+    def _parse_timestamps(self, timestamp_strs: List[str]) -> List[Optional[datetime]]:
+        """
+        Parse ISO 8601 timestamps with one vectorized pandas call, into the same
+        datetimes datetime.fromisoformat returns. Timestamps with a UTC offset
+        become aware UTC datetimes, naive ones stay naive, so the database
+        driver keeps reading them as local time like the prediction timestamps.
+        Invalid timestamps become None.
+        """
+        parsed = pd.to_datetime(
+            timestamp_strs, format="ISO8601", utc=True, errors="coerce"
+        )
+        has_offset = (
+            pd.Series(timestamp_strs, dtype=object)
+            .str.contains(UTC_OFFSET_PATTERN, regex=True, na=False)
+            .tolist()
+        )
+
+        # Naive strings are parsed as if they were UTC, so dropping the time zone
+        # gives back their wall clock time unchanged
+        timestamps: List[Optional[datetime]] = []
+        for timestamp, offset, is_invalid in zip(
+            parsed.to_pydatetime().tolist(), has_offset, parsed.isna().tolist()
+        ):
+            if is_invalid:
+                timestamps.append(None)
+            elif offset:
+                timestamps.append(timestamp)
+            else:
+                timestamps.append(timestamp.replace(tzinfo=None))
+
+        # Check the batch against the parser the readings have always been read
+        # with, and fall back to it row by row if pandas disagrees
+        first_valid = next(
+            (i for i, timestamp in enumerate(timestamps) if timestamp is not None),
+            None,
+        )
+        if first_valid is not None:
+            timestamp_str = timestamp_strs[first_valid]
+            if timestamps[first_valid] != self._parse_timestamp(timestamp_str):
+                logger.warning(
+                    f"Timestamp '{timestamp_str}' parsed differently by pandas, "
+                    "parsing the batch row by row"
+                )
+                return [self._parse_timestamp(value) for value in timestamp_strs]
+
+        return timestamps
+
+    def _parse_timestamp(self, timestamp_str: str) -> Optional[datetime]:
+        try:
+            # Python 3.11+ parses a trailing "Z" natively
+            return datetime.fromisoformat(timestamp_str)
+        except ValueError:
+            return None
+
+    def _add_row_errors(
+        self, errors: List[str], row_errors: List[Tuple[int, str]]
+    ) -> None:
+        """
+        Add row errors in row order, up to MAX_VALIDATION_ERRORS in total. When
+        an error is dropped a notice is added once, after the last error.
+        """
+        row_errors.sort()
+        remaining_errors = max(MAX_VALIDATION_ERRORS - len(errors), 0)
+        errors.extend(message for _, message in row_errors[:remaining_errors])
+
+        if len(row_errors) > remaining_errors and len(errors) == MAX_VALIDATION_ERRORS:
+            errors.append(
+                f"Only the first {MAX_VALIDATION_ERRORS} errors are shown, "
+                "validation stopped there"
+            )
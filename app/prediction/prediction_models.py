@@ -1,14 +1,16 @@
 from datetime import datetime
-from typing import Optional
+from typing import NamedTuple, Optional
 
 from pydantic import BaseModel
 
 
-class PowerPrediction(BaseModel):
+class PowerPredictionRecord(NamedTuple):
+    """Row of the power_predictions insert, fields in column order"""
+
     prediction_time: datetime
     model_id: int
     created_at: datetime
-    predicted_power: Optional[float] = None
+    predicted_power: Optional[float]
     horizon: float
 
 
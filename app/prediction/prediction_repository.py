@@ -1,15 +1,34 @@
 import asyncio
 import logging
-from typing import List
+import time
+import asyncpg
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
 from datetime import datetime
-from app.prediction.prediction_models import PowerPrediction
+from app.prediction.prediction_models import PowerPredictionRecord
 from app.config.database import db_manager
 
 logger = logging.getLogger(__name__)
 
+# Batches smaller than this are inserted with execute_many, larger ones with COPY
+COPY_BATCH_THRESHOLD = 500
+# Upper bound on how many queued records the writer coalesces into one insert
+MAX_WRITE_BATCH_SIZE = 50000
+# Forecast query results are cached per (model_id, start_date, end_date) and
+# dropped for a model as soon as new predictions for it are written
+FORECAST_CACHE_SIZE = 256
+FORECAST_CACHE_TTL_SECONDS = 600
+
 
 class PredictionRepository:
     def __init__(self):
+        self.columns = [
+            "prediction_time",
+            "model_id",
+            "created_at",
+            "predicted_power",
+            "horizon",
+        ]
         self.insert_query = """
             INSERT INTO power_predictions (
                 prediction_time, model_id, created_at, predicted_power, horizon
@@ -17,14 +36,45 @@ class PredictionRepository:
                 $1, $2, $3, $4, $5
             ) ON CONFLICT (prediction_time, model_id, created_at) DO NOTHING
         """
+        self._write_queue: asyncio.Queue[List[PowerPredictionRecord]] = (
+            asyncio.Queue()
+        )
+        self._writer_task: Optional[asyncio.Task] = None
+        self._forecast_cache: OrderedDict[
+            Tuple[int, datetime, datetime], Tuple[float, List[asyncpg.Record]]
+        ] = OrderedDict()
+
+    def start_writer(self) -> None:
+        """Start the background task that writes queued predictions"""
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._run_writer())
+
+    async def stop_writer(self) -> None:
+        """Write out all queued predictions and stop the background writer"""
+        if self._writer_task is None:
+            return
+
+        await self._write_queue.join()
+        self._writer_task.cancel()
+        await asyncio.gather(self._writer_task, return_exceptions=True)
+        self._writer_task = None
 
     async def get_forecast_data(
         self, model_id: int, start_date: datetime, end_date: datetime
-    ) -> List[dict]:
+    ) -> List[asyncpg.Record]:
         """
         Fetch forecast data for a specific model within a date range.
         Returns only the most recent prediction for each prediction time.
         """
+        cache_key = (model_id, start_date, end_date)
+        cached = self._forecast_cache.get(cache_key)
+        if cached is not None:
+            expires_at, forecast_data = cached
+            if expires_at > time.monotonic():
+                self._forecast_cache.move_to_end(cache_key)
+                return forecast_data
+            del self._forecast_cache[cache_key]
+
         query = """
             SELECT DISTINCT ON (prediction_time) 
                 model_id as id,
@@ -38,15 +88,32 @@ class PredictionRepository:
         """
 
         try:
-            rows = await db_manager.execute(query, model_id, start_date, end_date)
-            return [dict(row) for row in rows]
+            forecast_data = await db_manager.execute(
+                query, model_id, start_date, end_date
+            )
         except Exception as e:
             logger.error(f"Failed to fetch forecast data for model {model_id}: {e}")
             raise
 
+        self._forecast_cache[cache_key] = (
+            time.monotonic() + FORECAST_CACHE_TTL_SECONDS,
+            forecast_data,
+        )
+        if len(self._forecast_cache) > FORECAST_CACHE_SIZE:
+            self._forecast_cache.popitem(last=False)
+
+        return forecast_data
+
+    def _invalidate_forecast_cache(self, model_ids: Iterable[int]) -> None:
+        """Drop cached forecast data for models that received new predictions"""
+        model_ids = set(model_ids)
+        stale_keys = [key for key in self._forecast_cache if key[0] in model_ids]
+        for key in stale_keys:
+            del self._forecast_cache[key]
+
     async def get_forecast_data_by_time_of_forecast(
         self, model_id: int, created_at: datetime
-    ) -> List[dict]:
+    ) -> List[asyncpg.Record]:
         """
         Fetch forecast data for a specific model and created_at timestamp.
         Returns all predictions from that specific forecast run.
@@ -63,8 +130,7 @@ class PredictionRepository:
         """
 
         try:
-            rows = await db_manager.execute(query, model_id, created_at)
-            return [dict(row) for row in rows]
+            return await db_manager.execute(query, model_id, created_at)
         except Exception as e:
             logger.error(
                 f"Failed to fetch forecast data for model {model_id} and created_at {created_at}: {e}"
@@ -92,54 +158,50 @@ class PredictionRepository:
             )
             raise
 
-    def save_power_predictions_batch(self, predictions: List[PowerPrediction]) -> None:
-        try:
-            loop = asyncio.get_event_loop()
-
-            # Create the task without waiting for it
-            task = loop.create_task(
-                self._save_power_predictions_batch_async(predictions)
-            )
-
-            # Add error handling callback
-            task.add_done_callback(self._handle_save_completion)
-
-            logger.info(
-                f"Started background save task for {len(predictions)} power predictions"
-            )
-
-        except Exception as e:
-            logger.error(f"Failed to start power prediction save task: {e}")
+    def save_power_predictions_batch(
+        self, prediction_records: List[PowerPredictionRecord]
+    ) -> None:
+        """Queue predictions for the background writer without waiting for the insert"""
+        self._write_queue.put_nowait(prediction_records)
+        logger.info(f"Queued {len(prediction_records)} power predictions for saving")
+
+    async def _run_writer(self) -> None:
+        """Drain the write queue, coalescing queued batches into fewer inserts"""
+        while True:
+            batches = [await self._write_queue.get()]
+            record_count = len(batches[0])
+
+            while (
+                record_count < MAX_WRITE_BATCH_SIZE and not self._write_queue.empty()
+            ):
+                batch = self._write_queue.get_nowait()
+                batches.append(batch)
+                record_count += len(batch)
+
+            try:
+                records = [record for batch in batches for record in batch]
+                saved_count = await self._save_power_predictions_batch_async(records)
+                logger.debug(f"Saved {saved_count} power predictions")
+                self._invalidate_forecast_cache(record.model_id for record in records)
+            finally:
+                for _ in batches:
+                    self._write_queue.task_done()
 
     async def _save_power_predictions_batch_async(
-        self, predictions: List[PowerPrediction]
+        self, prediction_records: List[PowerPredictionRecord]
     ) -> int:
-        if not predictions:
+        if not prediction_records:
             return 0
 
         try:
-            prediction_records = []
-            for prediction in predictions:
-                record = (
-                    prediction.prediction_time,
-                    prediction.model_id,
-                    prediction.created_at,
-                    prediction.predicted_power,
-                    prediction.horizon,
+            if len(prediction_records) < COPY_BATCH_THRESHOLD:
+                await db_manager.execute_many(self.insert_query, prediction_records)
+            else:
+                await db_manager.copy_records_ignore_conflicts(
+                    "power_predictions", self.columns, prediction_records
                 )
-                prediction_records.append(record)
-
-            await db_manager.execute_many(self.insert_query, prediction_records)
-            return len(predictions)
+            return len(prediction_records)
 
         except Exception as e:
             logger.error(f"Failed to save power predictions batch: {e}")
             return 0
-
-    def _handle_save_completion(self, task: asyncio.Task):
-        """Callback to handle task completion and errors"""
-        try:
-            result = task.result()
-            logger.debug(f"Power prediction save task completed with result: {result}")
-        except Exception as e:
-            logger.error(f"Power prediction save task failed: {e}")
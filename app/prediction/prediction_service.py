@@ -1,15 +1,14 @@
+import asyncio
 import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from app.prediction.data_preparation_service import DataPreparationService
-from app.prediction.prediction_models import PowerPrediction
+from app.prediction.prediction_models import PowerPredictionRecord
 from app.prediction.prediction_repository import PredictionRepository
 from app.prediction.state.state_manager import StateManager
 from app.common.models.ml_models import MLModel
-from app.prediction.weather_forecast.weather_forecast_models import (
-    WeatherDataPoint,
-    WeatherForecast,
-)
+from app.prediction.weather_forecast.weather_forecast_models import WeatherForecast
 from app.prediction.weather_forecast.weather_forecast_service import (
     WeatherForecastService,
 )
@@ -30,31 +29,37 @@ class PredictionService:
         self._data_preparation_service = data_preparation_service
         self._prediction_repository = prediction_repository
 
-    def predict(self, custom_start_time: Optional[datetime] = None):
+    async def predict(self, custom_start_time: Optional[datetime] = None):
         logger.info("Starting prediction")
         if custom_start_time:
             logger.info(f"Using custom start time: {custom_start_time}")
+        # State refresh makes blocking HTTP calls, so it runs in a worker thread
+        # to keep the API responsive during a prediction cycle
         logger.info("Refreshing state")
-        self._state_manager.refresh_state()
+        await asyncio.to_thread(self._state_manager.refresh_state)
         power_plants = self._state_manager.get_active_power_plants()
         logger.info(f"Getting weather forecasts for {len(power_plants)} power plants")
 
         weather_forecasts = (
-            self._weather_forecast_service.get_weather_forecast_for_all_power_plants(
+            await self._weather_forecast_service.get_weather_forecast_for_all_power_plants(
                 power_plants, custom_start_time
             )
         )
 
         logger.info("Saving weather forecasts")
-        self._weather_forecast_service.save_weather_forecasts(weather_forecasts)
+        await self._weather_forecast_service.save_weather_forecasts(weather_forecasts)
 
         logger.info(
             f"Creating predictions for {len(weather_forecasts)} weather forecasts"
         )
-        for weather_forecast in weather_forecasts:
-            self._create_predictions_for_weather_forecast(weather_forecast)
+        await asyncio.gather(
+            *(
+                self._create_predictions_for_weather_forecast(weather_forecast)
+                for weather_forecast in weather_forecasts
+            )
+        )
 
-    def _create_predictions_for_weather_forecast(
+    async def _create_predictions_for_weather_forecast(
         self,
         weather_forecast: WeatherForecast,
     ):
@@ -62,6 +67,17 @@ class PredictionService:
             f"Creating predictions for power plant {weather_forecast.power_plant_id}"
         )
 
+        # The power plant and its models are looked up once per forecast rather
+        # than by every model's worker thread
+        power_plant = self._state_manager.get_active_power_plant(
+            weather_forecast.power_plant_id
+        )
+        if power_plant is None:
+            logger.error(
+                f"Power plant {weather_forecast.power_plant_id} is no longer active"
+            )
+            return
+
         models = self._state_manager.get_active_models_for_power_plant(
             weather_forecast.power_plant_id
         )
@@ -69,64 +85,87 @@ class PredictionService:
             f"Found {len(models)} models for power plant {weather_forecast.power_plant_id}"
         )
 
-        for model in models:
-            try:
-                self._create_predictions_for_model(weather_forecast, model)
+        # Models of a plant often share a feature list, so their inputs are
+        # prepared once per list and forecast
+        model_inputs_cache: Dict[Tuple[str, ...], np.ndarray] = {}
+
+        # Data preparation and model.predict are CPU bound, so each model runs
+        # in a worker thread to keep the event loop free while they overlap
+        results = await asyncio.gather(
+            *(
+                asyncio.to_thread(
+                    self._create_predictions_for_model,
+                    weather_forecast,
+                    power_plant.capacity,
+                    model,
+                    model_inputs_cache,
+                )
+                for model in models
+            ),
+            return_exceptions=True,
+        )
 
-            except Exception as e:
+        for model, result in zip(models, results):
+            if isinstance(result, Exception):
                 logger.error(
-                    f"Error creating predictions for model {model.metadata.id}: {e}"
+                    f"Error creating predictions for model {model.metadata.id}: {result}"
                 )
+                continue
 
-    def _create_predictions_for_model(
-        self, weather_forecast: WeatherForecast, model: MLModel
-    ):
-        logger.info(f"Creating predictions for model {model.metadata.id}")
-
-        logger.info(f"Preparing data for model {model.metadata.id}")
-        model_inputs = self._data_preparation_service.prepare_data(
-            weather_forecast,
-            model.features,
-            self._state_manager.get_active_power_plant(
-                weather_forecast.power_plant_id
-            ).capacity,
-        )
+            logger.info("Saving predictions for model %s", model.metadata.id)
+            self._prediction_repository.save_power_predictions_batch(result)
 
-        logger.info(f"Predicting for model {model.metadata.id}")
-        predictions = model.predict(model_inputs)
-        power_predictions = self._map_to_power_predictions(
-            predictions, weather_forecast, model
-        )
+    def _create_predictions_for_model(
+        self,
+        weather_forecast: WeatherForecast,
+        power_plant_capacity: int,
+        model: MLModel,
+        model_inputs_cache: Dict[Tuple[str, ...], np.ndarray],
+    ) -> List[PowerPredictionRecord]:
+        # Per model logs use lazy %-formatting, they run for every model and plant
+        logger.info("Creating predictions for model %s", model.metadata.id)
+
+        features_key = tuple(model.features)
+        model_inputs = model_inputs_cache.get(features_key)
+        if model_inputs is None:
+            logger.info("Preparing data for model %s", model.metadata.id)
+            model_inputs = self._data_preparation_service.prepare_data(
+                weather_forecast, model.features, power_plant_capacity
+            )
+            model_inputs_cache[features_key] = model_inputs
 
-        logger.info(f"Saving predictions for model {model.metadata.id}")
-        self._prediction_repository.save_power_predictions_batch(power_predictions)
+        logger.info("Predicting for model %s", model.metadata.id)
+        # Each model gets its own copy, so one that changes its inputs in place
+        # cannot affect the others
+        predictions = model.predict(model_inputs.copy())
+        return self._map_to_power_predictions(predictions, weather_forecast, model)
 
     def _map_to_power_predictions(
         self,
         predictions: List[float],
         weather_forecast: WeatherForecast,
         model: MLModel,
-    ) -> List[PowerPrediction]:
+    ) -> List[PowerPredictionRecord]:
         logger.info(
-            f"Mapping predictions to power predictions for model {model.metadata.id}"
+            "Mapping predictions to power predictions for model %s", model.metadata.id
         )
-        power_predictions = []
-
-        for i, data_point in enumerate(weather_forecast.forecast_data):
-            if i < len(predictions):
-                horizon_hours = self._calculate_horizon(data_point, weather_forecast)
-
-                prediction = PowerPrediction(
-                    prediction_time=data_point.time,
-                    model_id=model.metadata.id,
-                    created_at=weather_forecast.fetch_time,
-                    predicted_power=float(predictions[i]),
-                    horizon=horizon_hours,
-                )
-                power_predictions.append(prediction)
-        return power_predictions
-
-    def _calculate_horizon(
-        self, data_point: WeatherDataPoint, weather_forecast: WeatherForecast
-    ) -> float:
-        return (data_point.time - weather_forecast.fetch_time).total_seconds() / 3600.0
+        record = PowerPredictionRecord
+        model_id = model.metadata.id
+        created_at = weather_forecast.fetch_time
+        # Convert to Python floats in a single C loop instead of float() per element
+        predicted_powers = np.asarray(predictions, dtype=float).ravel().tolist()
+
+        # Records are built in insert column order so the repository can pass
+        # them to the database as they are
+        return [
+            record(
+                data_point.time,
+                model_id,
+                created_at,
+                predicted_power,
+                (data_point.time - created_at).total_seconds() / 3600.0,
+            )
+            for data_point, predicted_power in zip(
+                weather_forecast.forecast_data, predicted_powers
+            )
+        ]
@@ -61,7 +61,7 @@ class PredictionScheduler:
         job_id = "prediction_generation"
         try:
             logger.info(f"Starting scheduled task: {job_id}")
-            self.prediction_service.predict()
+            await self.prediction_service.predict()
             logger.info(f"Scheduled task completed successfully: {job_id}")
 
         except Exception as e:
@@ -1,27 +1,60 @@
-from typing import Dict, List
+import orjson
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from app.common.models.ml_models import MLModel
 from app.common.models.model_factory import ModelFactory
 from app.common.connectors.model_manager.model_manager_connector import (
     ModelManagerConnector,
 )
-from app.common.connectors.model_manager.model_manager_models import PowerPlant
+from app.common.connectors.model_manager.model_manager_models import (
+    ModelFileDownload,
+    ModelMetadata,
+    PowerPlant,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on model files downloaded in parallel during a state refresh
+MAX_PARALLEL_DOWNLOADS = 8
+
 
 class StateManager:
     def __init__(self, model_manager_connector: ModelManagerConnector):
         self._active_power_plants: Dict[int, PowerPlant] = {}
+        # Read-only snapshot of the active power plants, rebuilt on each refresh
+        self._active_power_plant_list: Tuple[PowerPlant, ...] = ()
         self._active_models: Dict[int, List[MLModel]] = {}
+        # ETag of the file each loaded model was created from, by model id
+        self._model_etags: Dict[int, str] = {}
         self._model_manager_connector: ModelManagerConnector = model_manager_connector
+        # Pre-serialized status summary together with the power plant and model
+        # dicts it was built from. Refreshes swap in new dicts, which invalidates it.
+        self._state_summary: Optional[Tuple[dict, dict, dict]] = None
+        self._refresh_lock = threading.Lock()
+        self._refresh_count = 0
 
     def refresh_state(self):
-        self._refresh_power_plant_state()
-        self._refresh_model_state()
+        refresh_count = self._refresh_count
+        with self._refresh_lock:
+            # Callers that arrive while a refresh is running share its result
+            # instead of downloading everything again
+            if self._refresh_count != refresh_count:
+                return
 
-    def get_active_power_plants(self) -> List[PowerPlant]:
-        return list(self._active_power_plants.values())
+            # Power plants and models come from independent endpoints, so the
+            # power plants are refreshed in a separate thread while models load
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                power_plant_refresh = executor.submit(self._refresh_power_plant_state)
+                self._refresh_model_state(power_plant_refresh)
+                power_plant_refresh.result()
+
+            self._refresh_count += 1
+
+    def get_active_power_plants(self) -> Tuple[PowerPlant, ...]:
+        return self._active_power_plant_list
 
     def get_active_models_for_power_plant(self, power_plant_id: int) -> List[MLModel]:
         return self._active_models.get(power_plant_id, [])
@@ -29,16 +62,56 @@ class StateManager:
     def get_active_power_plant(self, power_plant_id: int) -> PowerPlant:
         return self._active_power_plants.get(power_plant_id)
 
+    def get_state_summary_json(self) -> Dict[str, orjson.Fragment]:
+        """
+        Active power plants and, per power plant, the metadata of its active
+        models, each already serialized for embedding in an orjson response.
+        Built once per state refresh and reused until the next one.
+        """
+        active_power_plants = self._active_power_plants
+        active_models = self._active_models
+
+        cached = self._state_summary
+        if (
+            cached is not None
+            and cached[0] is active_power_plants
+            and cached[1] is active_models
+        ):
+            return cached[2]
+
+        summary = {
+            "power_plants": [
+                power_plant.model_dump()
+                for power_plant in active_power_plants.values()
+            ],
+            "models": [
+                [
+                    model.metadata.model_dump()
+                    for model in active_models.get(power_plant_id, [])
+                ]
+                for power_plant_id in active_power_plants
+            ],
+        }
+        summary_json = {
+            key: orjson.Fragment(orjson.dumps(value)) for key, value in summary.items()
+        }
+
+        self._state_summary = (active_power_plants, active_models, summary_json)
+        return summary_json
+
     def _refresh_power_plant_state(self):
         try:
-            self._active_power_plants.clear()
-
             power_plants = self._model_manager_connector.fetch_active_power_plants()
 
+            # The new state is built aside and swapped in, so readers never see a
+            # partially loaded or, after a failed fetch, an empty state
             if power_plants is not None:
-                self._active_power_plants.clear()
-                for power_plant in power_plants:
-                    self._active_power_plants[power_plant.id] = power_plant
+                self._active_power_plants = {
+                    power_plant.id: power_plant for power_plant in power_plants
+                }
+                self._active_power_plant_list = tuple(
+                    self._active_power_plants.values()
+                )
                 logger.info(f"Successfully loaded {len(power_plants)} power plants")
             else:
                 logger.info("No active power plants received from model manager")
@@ -47,32 +120,139 @@ class StateManager:
             logger.error(f"Failed to load power plant state: {e}")
             return False
 
-    def _refresh_model_state(self):
+    def _refresh_model_state(self, power_plant_refresh: Future):
         try:
-            self._active_models.clear()
+            # Keep the loaded models so unchanged ones can be reused after the refresh
+            previous_models = {
+                model.metadata.id: model
+                for models in self._active_models.values()
+                for model in models
+            }
 
             models_metadata = (
                 self._model_manager_connector.fetch_active_models_metadata()
             )
 
+            # Keep the current models if the active list could not be fetched
             if models_metadata is None:
                 return
 
-            for model_metadata in models_metadata:
-                model_file = self._model_manager_connector.download_model_file(
-                    model_metadata.id
+            # Only models that can take part in a prediction are downloaded and
+            # kept, those of active power plants with coordinates, so the power
+            # plant refresh has to finish first. Skipped models are left out of
+            # the active models and so also out of the status summary.
+            power_plant_refresh.result()
+            usable_plant_ids = {
+                power_plant.id
+                for power_plant in self._active_power_plant_list
+                if power_plant.latitude and power_plant.longitude
+            }
+            usable_models_metadata = [
+                model_metadata
+                for model_metadata in models_metadata
+                if model_metadata.plant_id in usable_plant_ids
+            ]
+            skipped_count = len(models_metadata) - len(usable_models_metadata)
+            if skipped_count:
+                logger.info(
+                    f"Skipping {skipped_count} models of power plants that are not "
+                    "active or have no coordinates"
                 )
+            models_metadata = usable_models_metadata
 
-                if model_file is None:
-                    continue
+            if not models_metadata:
+                self._active_models = {}
+                self._model_etags = {}
+                return
+
+            # Downloads are I/O bound so they overlap in a thread pool, while the
+            # models are still created here, one at a time and in metadata order
+            with ThreadPoolExecutor(
+                max_workers=min(MAX_PARALLEL_DOWNLOADS, len(models_metadata))
+            ) as executor:
+                downloads = list(
+                    executor.map(
+                        lambda model_metadata: self._download_model_file(
+                            model_metadata, previous_models.get(model_metadata.id)
+                        ),
+                        models_metadata,
+                    )
+                )
+
+            # The new state is built aside and swapped in once complete, together
+            # with the ETags of the files its models were created from. ETags are
+            # only kept for models that made it into the state, so a failed
+            # refresh never leaves an ETag behind for a model that was not loaded.
+            active_models: Dict[int, List[MLModel]] = {}
+            model_etags: Dict[int, str] = {}
+            created_models: List[MLModel] = []
+            processed_count = 0
+            try:
+                for model_metadata, download in zip(models_metadata, downloads):
+                    processed_count += 1
+                    if download is None:
+                        continue
+
+                    if download.not_modified:
+                        model = previous_models[model_metadata.id]
+                        etag = self._model_etags.get(model_metadata.id)
+                    else:
+                        model = ModelFactory.create_model_from_file(
+                            model_metadata, download.file_path
+                        )
+                        created_models.append(model)
+                        etag = download.etag
 
-                model = ModelFactory.create_model(model_metadata, model_file)
+                    if etag:
+                        model_etags[model_metadata.id] = etag
 
-                plant_id = model_metadata.plant_id
-                if plant_id not in self._active_models:
-                    self._active_models[plant_id] = []
+                    active_models.setdefault(model_metadata.plant_id, []).append(model)
+            finally:
+                # Downloaded files of models that were not created after an error
+                for download in downloads[processed_count:]:
+                    if download is not None and download.file_path:
+                        try:
+                            os.remove(download.file_path)
+                        except OSError:
+                            pass
 
-                self._active_models[plant_id].append(model)
+            self._active_models = active_models
+            self._model_etags = model_etags
+            self._start_model_warm_up(created_models)
 
         except Exception as e:
             logger.error(f"Failed to load model state: {e}")
+
+    def _start_model_warm_up(self, models: List[MLModel]):
+        # New models load lazily, so they are loaded in the background while the
+        # prediction cycle fetches weather forecasts, rather than by its first
+        # predict. A predict that arrives earlier waits for or does the load.
+        if not models:
+            return
+
+        threading.Thread(
+            target=self._warm_up_models,
+            args=(models,),
+            name="model-warm-up",
+            daemon=True,
+        ).start()
+
+    def _warm_up_models(self, models: List[MLModel]):
+        for model in models:
+            try:
+                model.warm_up()
+            except Exception as e:
+                logger.warning(f"Failed to warm up model {model.metadata.id}: {e}")
+
+    def _download_model_file(
+        self, model_metadata: ModelMetadata, previous_model: Optional[MLModel]
+    ) -> Optional[ModelFileDownload]:
+        # Only a model loaded from the same metadata can be reused as it is, so
+        # the file is downloaded unconditionally for new or changed models
+        etag = None
+        if previous_model is not None and previous_model.metadata == model_metadata:
+            etag = self._model_etags.get(model_metadata.id)
+
+        return self._model_manager_connector.download_model_file_if_modified(
+            model_metadata.id, etag
+        )
@@ -1,6 +1,12 @@
+import orjson
 import requests
 import logging
-from typing import Optional, Tuple
+import threading
+import time
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Optional, Tuple
 from datetime import datetime, timedelta
 from app.common.connectors.model_manager.model_manager_models import PowerPlant
 from app.prediction.weather_forecast.weather_forecast_models import (
@@ -9,11 +15,30 @@ from app.prediction.weather_forecast.weather_forecast_models import (
 
 logger = logging.getLogger(__name__)
 
+# Responses are cached per location and start time, so a prediction run repeated
+# shortly after another one does not fetch the same forecasts again
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL_SECONDS = 600
+
 
 class OpenMeteoConnector:
     def __init__(self, base_url: str):
         self._base_url = base_url  # "https://api.open-meteo.com/v1/forecast"
         self._timeout = 30
+        # One pooled session so per-plant requests to Open-Meteo reuse connections
+        self._session = requests.Session()
+        self._session.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=16,
+                # Rate limited requests are retried too, after the Retry-After
+                # delay when Open-Meteo sends one
+                max_retries=Retry(
+                    total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504]
+                ),
+            ),
+        )
         self.weather_parameters = [
             "temperature_2m",
             "relative_humidity_2m",
@@ -33,10 +58,16 @@ class OpenMeteoConnector:
             "diffuse_radiation_instant",
             "direct_radiation_instant",
         ]
+        self._minutely_15 = ",".join(self.weather_parameters)
+        # Requests run in worker threads, so the cache is guarded by a lock
+        self._response_cache: OrderedDict[
+            Tuple[float, float, datetime], Tuple[float, OpenMeteoResponse]
+        ] = OrderedDict()
+        self._response_cache_lock = threading.Lock()
 
     def fetch_weather_forecast(
         self, power_plant: PowerPlant, custom_start_time: Optional[datetime] = None
-    ) -> Tuple[datetime, Optional[OpenMeteoResponse]]:
+    ) -> Optional[Tuple[datetime, OpenMeteoResponse]]:
 
         if not power_plant.latitude or not power_plant.longitude:
             logger.warning(f"Power plant {power_plant.id} missing coordinates")
@@ -46,24 +77,25 @@ class OpenMeteoConnector:
             fetch_time = (
                 custom_start_time if custom_start_time else self._get_normalized_time()
             )
-            start_time_str, end_time_str = self._get_72h_time_range(fetch_time)
-
-            params = {
-                "latitude": power_plant.latitude,
-                "longitude": power_plant.longitude,
-                "minutely_15": ",".join(self.weather_parameters),
-                "start_minutely_15": start_time_str,
-                "end_minutely_15": end_time_str,
-                "timezone": "Europe/Zagreb",  # If needed in the future, make this configurable
-            }
-
-            response = requests.get(
+            cache_key = (power_plant.latitude, power_plant.longitude, fetch_time)
+            open_meteo_response = self._get_cached_response(cache_key)
+            if open_meteo_response is not None:
+                return fetch_time, open_meteo_response
+
+            params = self._build_params(
+                power_plant.latitude, power_plant.longitude, fetch_time
+            )
+
+            response = self._session.get(
                 self._base_url, params=params, timeout=self._timeout
             )
             response.raise_for_status()
 
-            data = response.json()
-            return fetch_time, OpenMeteoResponse(**data)
+            open_meteo_response = OpenMeteoResponse.model_validate_json(
+                response.content
+            )
+            self._cache_response(cache_key, open_meteo_response)
+            return fetch_time, open_meteo_response
 
         except requests.exceptions.RequestException as e:
             logger.error(
@@ -76,6 +108,121 @@ class OpenMeteoConnector:
             )
             return None
 
+    def fetch_weather_forecast_batch(
+        self,
+        power_plants: List[PowerPlant],
+        custom_start_time: Optional[datetime] = None,
+    ) -> Optional[Tuple[datetime, List[OpenMeteoResponse]]]:
+        """
+        Fetch forecasts for several power plants in a single request, passing
+        the coordinates as comma-separated lists. Responses are returned in
+        power plant order. All power plants must have coordinates.
+        """
+        plant_ids = [power_plant.id for power_plant in power_plants]
+
+        try:
+            fetch_time = (
+                custom_start_time if custom_start_time else self._get_normalized_time()
+            )
+            cache_keys = [
+                (power_plant.latitude, power_plant.longitude, fetch_time)
+                for power_plant in power_plants
+            ]
+            responses = {}
+            for cache_key in cache_keys:
+                open_meteo_response = self._get_cached_response(cache_key)
+                if open_meteo_response is not None:
+                    responses[cache_key] = open_meteo_response
+
+            # Only locations without a cached response are requested
+            missing_keys = list(
+                dict.fromkeys(key for key in cache_keys if key not in responses)
+            )
+            if missing_keys:
+                params = self._build_params(
+                    ",".join(str(latitude) for latitude, _, _ in missing_keys),
+                    ",".join(str(longitude) for _, longitude, _ in missing_keys),
+                    fetch_time,
+                )
+
+                response = self._session.get(
+                    self._base_url, params=params, timeout=self._timeout
+                )
+                response.raise_for_status()
+
+                data = orjson.loads(response.content)
+                # Open-Meteo returns a single object instead of a list for one location
+                if isinstance(data, dict):
+                    data = [data]
+
+                if len(data) != len(missing_keys):
+                    raise ValueError(
+                        f"expected {len(missing_keys)} locations, got {len(data)}"
+                    )
+
+                for cache_key, item in zip(missing_keys, data):
+                    open_meteo_response = OpenMeteoResponse.model_validate(item)
+                    self._cache_response(cache_key, open_meteo_response)
+                    responses[cache_key] = open_meteo_response
+
+            return fetch_time, [responses[cache_key] for cache_key in cache_keys]
+
+        except requests.exceptions.RequestException as e:
+            logger.error(
+                f"Failed to fetch weather data for power plants {plant_ids}: {e}"
+            )
+            return None
+        except Exception as e:
+            logger.error(
+                f"Unexpected error while fetching weather data for power plants {plant_ids}: {e}"
+            )
+            return None
+
+    def close(self) -> None:
+        self._session.close()
+
+    def _get_cached_response(
+        self, cache_key: Tuple[float, float, datetime]
+    ) -> Optional[OpenMeteoResponse]:
+        with self._response_cache_lock:
+            cached = self._response_cache.get(cache_key)
+            if cached is None:
+                return None
+
+            expires_at, open_meteo_response = cached
+            if expires_at <= time.monotonic():
+                del self._response_cache[cache_key]
+                return None
+
+            self._response_cache.move_to_end(cache_key)
+            return open_meteo_response
+
+    def _cache_response(
+        self,
+        cache_key: Tuple[float, float, datetime],
+        open_meteo_response: OpenMeteoResponse,
+    ) -> None:
+        with self._response_cache_lock:
+            self._response_cache[cache_key] = (
+                time.monotonic() + RESPONSE_CACHE_TTL_SECONDS,
+                open_meteo_response,
+            )
+            self._response_cache.move_to_end(cache_key)
+            while len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+
+    def _build_params(self, latitude, longitude, fetch_time: datetime) -> dict:
+        start_time_str, end_time_str = self._get_72h_time_range(fetch_time)
+
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "minutely_15": self._minutely_15,
+            "start_minutely_15": start_time_str,
+            "end_minutely_15": end_time_str,
+            "timezone": "Europe/Zagreb",  # If needed in the future, make this configurable
+        }
+
     def _get_normalized_time(self) -> datetime:
         """Get current time normalized to 00 minutes and seconds"""
         now = datetime.now()
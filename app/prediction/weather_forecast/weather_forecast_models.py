@@ -1,10 +1,16 @@
-from typing import List, Optional
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 from datetime import datetime
 
-from pydantic import BaseModel
+import numpy as np
+from pydantic import BaseModel, ConfigDict
 
 
-class WeatherDataPoint(BaseModel):
+# A plain slotted dataclass rather than a pydantic model: one is built per 15
+# minute step and plant from already typed Open-Meteo data, so validation and a
+# per-instance __dict__ would only cost time and memory
+@dataclass(slots=True)
+class WeatherDataPoint:
     time: datetime
     temperature_2m: Optional[float] = None
     relative_humidity_2m: Optional[float] = None
@@ -33,6 +39,11 @@ class WeatherForecast(BaseModel):
     elevation: float
     forecast_data: List[WeatherDataPoint]
     fetch_time: datetime
+    # The same data points by weather variable, aligned with forecast_data and
+    # with NaN for missing values
+    forecast_columns: Dict[str, np.ndarray] = {}
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 
 class OpenMeteoResponse(BaseModel):
@@ -1,42 +1,114 @@
 import asyncio
 import logging
-from typing import List
+from operator import attrgetter
+from typing import List, Optional, Tuple
 from app.prediction.weather_forecast.weather_forecast_models import WeatherForecast
 from app.config.database import db_manager
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on forecast batches waiting to be written. Callers wait for room,
+# up to WRITE_QUEUE_TIMEOUT_SECONDS, before their batch is dropped.
+MAX_QUEUED_WRITES = 1024
+WRITE_QUEUE_TIMEOUT_SECONDS = 30
+# Upper bound on how many queued forecasts the writer coalesces into one COPY
+MAX_WRITE_BATCH_SIZE = 500
+
 
 class WeatherForecastRepository:
     def __init__(self):
-        self._insert_query = """
-            INSERT INTO weather_forecasts (
-                forecast_time, plant_id, created_at, temperature_2m, relative_humidity_2m,
-                cloud_cover, cloud_cover_low, cloud_cover_mid, wind_speed_10m, wind_direction_10m,
-                shortwave_radiation, shortwave_radiation_instant, diffuse_radiation,
-                diffuse_radiation_instant, direct_normal_irradiance, et0_fao_evapotranspiration,
-                vapour_pressure_deficit, is_day, sunshine_duration
-            ) VALUES (
-                $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19
-            ) ON CONFLICT (forecast_time, plant_id, created_at) DO NOTHING
+        self._columns = [
+            "forecast_time",
+            "plant_id",
+            "created_at",
+            "temperature_2m",
+            "relative_humidity_2m",
+            "cloud_cover",
+            "cloud_cover_low",
+            "cloud_cover_mid",
+            "wind_speed_10m",
+            "wind_direction_10m",
+            "shortwave_radiation",
+            "shortwave_radiation_instant",
+            "diffuse_radiation",
+            "diffuse_radiation_instant",
+            "direct_normal_irradiance",
+            "et0_fao_evapotranspiration",
+            "vapour_pressure_deficit",
+            "is_day",
+            "sunshine_duration",
+        ]
+        # Weather values of a data point, everything after the three key columns,
+        # read in one call per data point
+        self._get_data_point_values = attrgetter(*self._columns[3:])
+        self._write_queue: asyncio.Queue[List[WeatherForecast]] = asyncio.Queue(
+            maxsize=MAX_QUEUED_WRITES
+        )
+        self._writer_task: Optional[asyncio.Task] = None
+        # Forecasts dropped because the write queue stayed full, since startup
+        self.dropped_forecast_count = 0
+
+    def start_writer(self) -> None:
+        """Start the background task that writes queued weather forecasts"""
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._run_writer())
+
+    async def stop_writer(self) -> None:
+        """Write out all queued weather forecasts and stop the background writer"""
+        if self._writer_task is None:
+            return
+
+        await self._write_queue.join()
+        self._writer_task.cancel()
+        await asyncio.gather(self._writer_task, return_exceptions=True)
+        self._writer_task = None
+
+    async def save_weather_forecasts_batch(
+        self, forecasts: List[WeatherForecast]
+    ) -> bool:
+        """
+        Queue weather forecasts for the background writer. While the queue is
+        full this waits for room, and drops the batch after a timeout. Returns
+        whether the forecasts were queued.
         """
-
-    def save_weather_forecasts_batch(self, forecasts: List[WeatherForecast]) -> None:
         try:
-            loop = asyncio.get_event_loop()
-
-            # Create the task without waiting for it
-            task = loop.create_task(self._save_weather_forecasts_batch_async(forecasts))
-
-            # Add error handling callback
-            task.add_done_callback(self._handle_save_completion)
+            await asyncio.wait_for(
+                self._write_queue.put(forecasts), WRITE_QUEUE_TIMEOUT_SECONDS
+            )
+            logger.info(f"Queued {len(forecasts)} weather forecasts for saving")
+            return True
 
-            logger.info(
-                f"Started background save task for {len(forecasts)} weather forecasts"
+        except asyncio.TimeoutError:
+            self.dropped_forecast_count += len(forecasts)
+            logger.warning(
+                f"Weather forecast write queue stayed full, dropping {len(forecasts)} "
+                f"forecasts for power plants "
+                f"{[forecast.power_plant_id for forecast in forecasts]} "
+                f"({self.dropped_forecast_count} dropped since startup)"
             )
+            return False
 
-        except Exception as e:
-            logger.error(f"Failed to start weather forecast save task: {e}")
+    async def _run_writer(self) -> None:
+        """Drain the write queue, coalescing queued batches into fewer COPYs"""
+        while True:
+            batches = [await self._write_queue.get()]
+            forecast_count = len(batches[0])
+
+            while (
+                forecast_count < MAX_WRITE_BATCH_SIZE
+                and not self._write_queue.empty()
+            ):
+                batch = self._write_queue.get_nowait()
+                batches.append(batch)
+                forecast_count += len(batch)
+
+            try:
+                forecasts = [forecast for batch in batches for forecast in batch]
+                saved_count = await self._save_weather_forecasts_batch_async(forecasts)
+                logger.debug(f"Saved weather forecasts for {saved_count} power plants")
+            finally:
+                for _ in batches:
+                    self._write_queue.task_done()
 
     async def _save_weather_forecasts_batch_async(
         self, forecasts: List[WeatherForecast]
@@ -44,56 +116,55 @@ class WeatherForecastRepository:
         if not forecasts:
             return 0
 
-        successful_saves = 0
-
-        for forecast in forecasts:
-            success = await self._save_weather_forecast_async(forecast)
-            if success:
-                successful_saves += 1
-
-        return successful_saves
-
-    async def _save_weather_forecast_async(self, forecast: WeatherForecast) -> bool:
         try:
-            forecast_records = []
-            for data_point in forecast.forecast_data:
-                record = (
-                    data_point.time,  # forecast_time
-                    forecast.power_plant_id,  # plant_id
-                    forecast.fetch_time,  # created_at
-                    data_point.temperature_2m,
-                    data_point.relative_humidity_2m,
-                    data_point.cloud_cover,
-                    data_point.cloud_cover_low,
-                    data_point.cloud_cover_mid,
-                    data_point.wind_speed_10m,
-                    data_point.wind_direction_10m,
-                    data_point.shortwave_radiation,
-                    data_point.shortwave_radiation_instant,
-                    data_point.diffuse_radiation,
-                    data_point.diffuse_radiation_instant,
-                    data_point.direct_normal_irradiance,
-                    data_point.et0_fao_evapotranspiration,
-                    data_point.vapour_pressure_deficit,
-                    data_point.is_day,
-                    data_point.sunshine_duration,
-                )
-                forecast_records.append(record)
-
-            # Execute batch insert
-            await db_manager.execute_many(self._insert_query, forecast_records)
-            return True
+            # Records of all power plants are written with a single COPY
+            await self._copy_forecasts(forecasts)
+            return len(forecasts)
 
         except Exception as e:
-            logger.error(
-                f"Failed to save weather forecast for power plant {forecast.power_plant_id}: {e}"
+            if len(forecasts) == 1:
+                logger.error(
+                    f"Failed to save weather forecast for power plant "
+                    f"{forecasts[0].power_plant_id}: {e}"
+                )
+                return 0
+
+            logger.warning(
+                f"Failed to save weather forecasts for {len(forecasts)} power plants "
+                f"in one COPY, retrying per power plant: {e}"
             )
-            return False
 
-    def _handle_save_completion(self, task: asyncio.Task):
-        """Callback to handle task completion and errors"""
-        try:
-            result = task.result()
-            logger.debug(f"Weather forecast save task completed with result: {result}")
-        except Exception as e:
-            logger.error(f"Weather forecast save task failed: {e}")
+        # The failed COPY wrote nothing, so one bad forecast only loses itself
+        saved_count = 0
+        for forecast in forecasts:
+            try:
+                await self._copy_forecasts([forecast])
+                saved_count += 1
+            except Exception as e:
+                logger.error(
+                    f"Failed to save weather forecast for power plant "
+                    f"{forecast.power_plant_id}: {e}"
+                )
+
+        return saved_count
+
+    async def _copy_forecasts(self, forecasts: List[WeatherForecast]) -> None:
+        forecast_records = [
+            record
+            for forecast in forecasts
+            for record in self._to_forecast_records(forecast)
+        ]
+        await db_manager.copy_records_ignore_conflicts(
+            "weather_forecasts", self._columns, forecast_records
+        )
+
+    def _to_forecast_records(self, forecast: WeatherForecast) -> List[Tuple]:
+        """Build insert records in the order of self._columns"""
+        plant_id = forecast.power_plant_id
+        fetch_time = forecast.fetch_time
+        get_values = self._get_data_point_values
+
+        return [
+            (data_point.time, plant_id, fetch_time, *get_values(data_point))
+            for data_point in forecast.forecast_data
+        ]
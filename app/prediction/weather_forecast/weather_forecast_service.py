@@ -1,6 +1,11 @@
+import asyncio
+import warnings
+from dataclasses import fields
 from datetime import datetime
+from itertools import islice, zip_longest
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
 from app.common.connectors.model_manager.model_manager_models import PowerPlant
 from app.prediction.weather_forecast.open_meteo_connector import OpenMeteoConnector
 from app.prediction.weather_forecast.weather_forecast_models import (
@@ -14,6 +19,17 @@ from app.prediction.weather_forecast.weather_forecast_repository import (
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on concurrent Open-Meteo requests, to stay clear of rate limiting
+MAX_CONCURRENT_FETCHES = 8
+
+# Locations sent in one Open-Meteo request
+MAX_LOCATIONS_PER_REQUEST = 100
+
+# Open-Meteo minutely_15 variables, in the order of the WeatherDataPoint fields
+WEATHER_VARIABLES = [
+    field.name for field in fields(WeatherDataPoint) if field.name != "time"
+]
+
 
 class WeatherForecastService:
     def __init__(
@@ -24,137 +40,206 @@ class WeatherForecastService:
         self._open_meteo_connector = open_meteo_connector
         self._weather_forecast_repository = weather_forecast_repository
 
-    def get_weather_forecast(
-        self, power_plant: PowerPlant, custom_start_time: Optional[datetime] = None
-    ) -> WeatherForecast:
-        created_at, open_meteo_response = (
-            self._open_meteo_connector.fetch_weather_forecast(
-                power_plant, custom_start_time
+    async def get_weather_forecast_for_all_power_plants(
+        self,
+        power_plants: Sequence[PowerPlant],
+        custom_start_time: Optional[datetime] = None,
+    ) -> List[WeatherForecast]:
+        """
+        Fetch forecasts for all power plants in bulk requests of up to
+        MAX_LOCATIONS_PER_REQUEST locations. Power plants at the same
+        coordinates share one location and are returned next to each other.
+        Power plants whose forecast could not be fetched are left out.
+        """
+        plants_by_location: Dict[Tuple[float, float], List[PowerPlant]] = {}
+        missing_coordinates = []
+        for power_plant in power_plants:
+            if not power_plant.latitude or not power_plant.longitude:
+                missing_coordinates.append(power_plant.id)
+                continue
+            plants_by_location.setdefault(
+                (power_plant.latitude, power_plant.longitude), []
+            ).append(power_plant)
+
+        if missing_coordinates:
+            logger.warning(
+                f"Skipping {len(missing_coordinates)} of {len(power_plants)} power "
+                f"plants missing coordinates: {missing_coordinates}"
             )
-        )
-        return self._to_weather_forecast(
-            power_plant.id, created_at, open_meteo_response
-        )
 
-    def get_weather_forecast_for_all_power_plants(
+        location_groups = list(plants_by_location.values())
+        chunks = [
+            location_groups[i : i + MAX_LOCATIONS_PER_REQUEST]
+            for i in range(0, len(location_groups), MAX_LOCATIONS_PER_REQUEST)
+        ]
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+
+        async def fetch(chunk: List[List[PowerPlant]]) -> List[WeatherForecast]:
+            # The connector is blocking, so each request runs in a worker thread
+            async with semaphore:
+                return await asyncio.to_thread(
+                    self._get_weather_forecasts_batch, chunk, custom_start_time
+                )
+
+        chunk_forecasts = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+        return [
+            weather_forecast
+            for weather_forecasts in chunk_forecasts
+            for weather_forecast in weather_forecasts
+        ]
+
+    def _get_weather_forecasts_batch(
         self,
-        power_plants: List[PowerPlant],
+        location_groups: List[List[PowerPlant]],
         custom_start_time: Optional[datetime] = None,
     ) -> List[WeatherForecast]:
+        """
+        Fetch one forecast per location, using the first power plant of each
+        group for the request, and build a forecast for every plant in it
+        """
+        fetch_result = self._open_meteo_connector.fetch_weather_forecast_batch(
+            [power_plants[0] for power_plants in location_groups], custom_start_time
+        )
+        if fetch_result is not None:
+            created_at, open_meteo_responses = fetch_result
+            fetch_results = [
+                (created_at, open_meteo_response)
+                for open_meteo_response in open_meteo_responses
+            ]
+        else:
+            # A single bad location fails the whole request, so retry one by one
+            logger.warning(
+                f"Bulk weather fetch failed for {len(location_groups)} locations, "
+                "falling back to per location requests"
+            )
+            fetch_results = [
+                self._open_meteo_connector.fetch_weather_forecast(
+                    power_plants[0], custom_start_time
+                )
+                for power_plants in location_groups
+            ]
+
         weather_forecasts = []
-        for power_plant in power_plants:
-            weather_forecast = self.get_weather_forecast(power_plant, custom_start_time)
-            weather_forecasts.append(weather_forecast)
+        for power_plants, location_result in zip(location_groups, fetch_results):
+            if location_result is None:
+                continue
+
+            created_at, open_meteo_response = location_result
+            weather_forecasts.extend(
+                self._to_weather_forecasts(
+                    [power_plant.id for power_plant in power_plants],
+                    created_at,
+                    open_meteo_response,
+                )
+            )
+
         return weather_forecasts
 
-    def save_weather_forecasts(self, weather_forecasts: List[WeatherForecast]):
-        self._weather_forecast_repository.save_weather_forecasts_batch(
+    async def save_weather_forecasts(
+        self, weather_forecasts: List[WeatherForecast]
+    ) -> bool:
+        return await self._weather_forecast_repository.save_weather_forecasts_batch(
             weather_forecasts
         )
 
-    def _to_weather_forecast(
+    def _to_weather_forecasts(
         self,
-        plant_id: int,
+        plant_ids: List[int],
         fetch_time: datetime,
         open_meteo_response: OpenMeteoResponse,
-    ) -> WeatherForecast:
-        weather_point_list = self._get_weather_point_list(open_meteo_response)
-
-        weather_forecast = WeatherForecast(
-            power_plant_id=plant_id,
-            latitude=open_meteo_response.latitude,
-            longitude=open_meteo_response.longitude,
-            timezone=open_meteo_response.timezone,
-            elevation=open_meteo_response.elevation,
-            forecast_data=weather_point_list,
-            fetch_time=fetch_time,
+    ) -> List[WeatherForecast]:
+        """
+        Build a forecast for each power plant from one shared response. The
+        response is parsed once and its read-only data shared between them.
+        """
+        weather_point_list, forecast_columns = self._get_weather_point_list(
+            open_meteo_response
         )
 
-        return weather_forecast
+        return [
+            WeatherForecast.model_construct(
+                power_plant_id=plant_id,
+                latitude=open_meteo_response.latitude,
+                longitude=open_meteo_response.longitude,
+                timezone=open_meteo_response.timezone,
+                elevation=open_meteo_response.elevation,
+                forecast_data=weather_point_list,
+                fetch_time=fetch_time,
+                forecast_columns=forecast_columns,
+            )
+            for plant_id in plant_ids
+        ]
 
     def _get_weather_point_list(
         self, open_meteo_response: OpenMeteoResponse
-    ) -> List[WeatherDataPoint]:
+    ) -> Tuple[List[WeatherDataPoint], Dict[str, np.ndarray]]:
+        """
+        Build the forecast's data points, together with the same values as one
+        float64 array per weather variable for vectorised feature extraction
+        """
         weather_point_list = []
+        point_indices = []
         minutely_data = open_meteo_response.minutely_15
 
-        times = minutely_data.get("time", [])
-
-        for i, time_str in enumerate(times):
-            try:
-                time_obj = datetime.fromisoformat(time_str.replace("Z", "+00:00"))
-
-                data_point = WeatherDataPoint(
-                    time=time_obj,
-                    temperature_2m=self._get_value_at_index(
-                        minutely_data.get("temperature_2m"), i
-                    ),
-                    relative_humidity_2m=self._get_value_at_index(
-                        minutely_data.get("relative_humidity_2m"), i
-                    ),
-                    cloud_cover=self._get_value_at_index(
-                        minutely_data.get("cloud_cover"), i
-                    ),
-                    wind_speed_10m=self._get_value_at_index(
-                        minutely_data.get("wind_speed_10m"), i
-                    ),
-                    wind_direction_10m=self._get_value_at_index(
-                        minutely_data.get("wind_direction_10m"), i
-                    ),
-                    shortwave_radiation=self._get_value_at_index(
-                        minutely_data.get("shortwave_radiation"), i
-                    ),
-                    diffuse_radiation=self._get_value_at_index(
-                        minutely_data.get("diffuse_radiation"), i
-                    ),
-                    direct_normal_irradiance=self._get_value_at_index(
-                        minutely_data.get("direct_normal_irradiance"), i
-                    ),
-                    cloud_cover_low=self._get_value_at_index(
-                        minutely_data.get("cloud_cover_low"), i
-                    ),
-                    cloud_cover_mid=self._get_value_at_index(
-                        minutely_data.get("cloud_cover_mid"), i
-                    ),
-                    et0_fao_evapotranspiration=self._get_value_at_index(
-                        minutely_data.get("et0_fao_evapotranspiration"), i
-                    ),
-                    vapour_pressure_deficit=self._get_value_at_index(
-                        minutely_data.get("vapour_pressure_deficit"), i
-                    ),
-                    is_day=self._get_value_at_index(minutely_data.get("is_day"), i),
-                    sunshine_duration=self._get_value_at_index(
-                        minutely_data.get("sunshine_duration"), i
-                    ),
-                    shortwave_radiation_instant=self._get_value_at_index(
-                        minutely_data.get("shortwave_radiation_instant"), i
-                    ),
-                    diffuse_radiation_instant=self._get_value_at_index(
-                        minutely_data.get("diffuse_radiation_instant"), i
-                    ),
-                    direct_radiation_instant=self._get_value_at_index(
-                        minutely_data.get("direct_radiation_instant"), i
-                    ),
-                )
+        times = self._parse_times(minutely_data.get("time", []))
 
-                weather_point_list.append(data_point)
+        # Pull each variable's column out once and walk all columns in step,
+        # instead of looking every value up by name and index. Columns shorter
+        # than the time column are padded with None.
+        columns = [
+            minutely_data.get(variable) or [] for variable in WEATHER_VARIABLES
+        ]
+        rows = islice(zip_longest(times, *columns), len(times))
 
-            except Exception as e:
-                logger.warning(f"Failed to parse data point at index {i}: {e}")
+        for i, (time_obj, *values) in enumerate(rows):
+            if time_obj is None:
+                logger.warning(f"Failed to parse data point at index {i}: invalid time")
                 continue
 
+            # Values are in WeatherDataPoint field order, after time. Every row
+            # has one value per field and the dataclass does not validate, so
+            # building the data point cannot fail.
+            weather_point_list.append(WeatherDataPoint(time_obj, *values))
+            point_indices.append(i)
+
         if len(weather_point_list) > 0:
             weather_point_list = weather_point_list[1:]
+            point_indices = point_indices[1:]
             logger.debug(
                 "Removed first weather data point to avoid horizon=0 predictions"
             )
 
-        return weather_point_list
-
-    def _get_value_at_index(
-        self, data_array: Optional[List], index: int
-    ) -> Optional[float]:
-        """Safely get value from array at given index"""
-        if data_array is None or index >= len(data_array):
+        forecast_columns = {
+            variable: self._to_column_array(column, len(times))[point_indices]
+            for variable, column in zip(WEATHER_VARIABLES, columns)
+        }
+
+        return weather_point_list, forecast_columns
+
+    def _to_column_array(self, column: list, length: int) -> np.ndarray:
+        """Convert a value column to float64, with NaN for None and padding"""
+        column_array = np.full(length, np.nan)
+        values = column[:length]
+        column_array[: len(values)] = np.array(values, dtype=np.float64)
+        return column_array
+
+    def _parse_times(self, times: List[str]) -> List[Optional[datetime]]:
+        """
+        Parse the ISO 8601 time column in one vectorised numpy call. Columns
+        numpy cannot parse exactly, such as ones with UTC offsets, are parsed
+        one by one so that only the invalid entries become None.
+        """
+        try:
+            with warnings.catch_warnings():
+                # numpy only warns when it drops a UTC offset, treat that as failure
+                warnings.simplefilter("error")
+                return np.array(times, dtype="datetime64[s]").tolist()
+        except (TypeError, ValueError, Warning):
+            return [self._parse_time(time_str) for time_str in times]
+
+    def _parse_time(self, time_str: str) -> Optional[datetime]:
+        try:
+            # Python 3.11+ parses a trailing "Z" natively
+            return datetime.fromisoformat(time_str)
+        except (TypeError, ValueError):
             return None
-        return data_array[index]
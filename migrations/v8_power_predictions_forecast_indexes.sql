@@ -0,0 +1,9 @@
+-- Lets get_forecast_data walk (model_id, prediction_time, created_at DESC) in order for DISTINCT ON
+-- and read predicted_power from the index instead of sorting heap rows
+CREATE INDEX IF NOT EXISTS idx_power_predictions_forecast
+ON power_predictions (model_id, prediction_time, created_at DESC)
+INCLUDE (predicted_power);
+
+-- Serves get_unique_forecast_timestamps and get_forecast_data_by_time_of_forecast
+CREATE INDEX IF NOT EXISTS idx_power_predictions_model_created_at
+ON power_predictions (model_id, created_at DESC);